@@ -0,0 +1,206 @@
+#
+# License: https://creativecommons.org/licenses/by/4.0/ https://creativecommons.org/licenses/by/4.0/legalcode
+# © 2023 https://github.com/Oops19
+#
+
+"""
+Benchmarks for parsing, indexing, removal and tick dispatch with generated crontabs, no game installation is needed.
+
+python _headless/benchmark.py
+python _headless/benchmark.py --sizes 10 100 1000 10000 --repeat 5 --output benchmark.json
+"""
+
+
+import argparse
+import gc
+import json
+import platform
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+from run import generate_crontab_lines
+from environment import HeadlessEnvironment
+from crontab.enums.category import CrontabCategory
+from crontab.modinfo import ModInfo
+from crontab.scheduler import Scheduler
+from crontab.store.crontab_store import CrontabStore
+from crontab.store.manage_crontab import ManageCrontab
+
+
+def _nop(*args):
+    pass
+
+
+def reset():
+    """ Empty the store and the scheduler queues """
+    CrontabStore().__init__()
+    Scheduler.job_queue.clear()
+    Scheduler.in_flight.clear()
+    Scheduler.reset_profiling_data()
+
+
+def best_of(repeat: int, setup: Callable, function: Callable) -> float:
+    """ :return: The best wall time of 'repeat' runs in seconds, setup() is not measured """
+    best = float('inf')
+    for _ in range(repeat):
+        setup()
+        gc.collect()
+        t = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+def bench_parse(size: int, repeat: int) -> Dict:
+    lines = generate_crontab_lines(size)
+    mc = ManageCrontab()
+
+    def _add_lines():
+        for line in lines:
+            mc.add_crontab_line(line, save_data=False)
+
+    dt = best_of(repeat, reset, _add_lines)
+    return {'lines_per_s': size / dt, 'ms': dt * 1000}
+
+
+def bench_parse_time(repeat: int) -> Dict:
+    mc = ManageCrontab()
+    fields = (('*/5', CrontabCategory.MINUTE), ('8-17', CrontabCategory.HOUR), ('MO,WE,FR', CrontabCategory.WEEKDAY),
+              ('*', CrontabCategory.SEASON), ('0,4', CrontabCategory.MOON_PHASE))
+    calls = 1000
+
+    def _parse():
+        for _ in range(calls):
+            for value, category in fields:
+                # noinspection PyProtectedMember
+                mc._parse_time(value, category)
+
+    dt = best_of(repeat, lambda: None, _parse)
+    return {'fields_per_s': calls * len(fields) / dt}
+
+
+def bench_index(size: int, repeat: int) -> Dict:
+    lines = generate_crontab_lines(size)
+    mc = ManageCrontab()
+    cs = CrontabStore()
+    jobs = []
+
+    def _setup_parsed():
+        reset()
+        mc.add_jobs(lines, save_data=False)
+        jobs[:] = list(cs.cron_jobs.values())
+        reset()
+
+    def _add_all():
+        mc.add_parsed_jobs(jobs, {}, save_data=False)
+
+    def _add_one_by_one():
+        for job in jobs:
+            # noinspection PyProtectedMember
+            mc._add_job(job)
+
+    results = {
+        'add_jobs_ms': best_of(repeat, reset, lambda: mc.add_jobs(lines, save_data=False)) * 1000,
+        'add_all_ms': best_of(repeat, _setup_parsed, _add_all) * 1000,
+        'add_one_by_one_ms': best_of(repeat, _setup_parsed, _add_one_by_one) * 1000,
+    }
+
+    def _setup_loaded():
+        reset()
+        mc.add_jobs(lines, save_data=False)
+
+    def _remove_all():
+        for job_id in list(cs.cron_jobs.keys()):
+            mc.remove_job(job_id, save_data=False)
+
+    results['remove_us_per_job'] = best_of(repeat, _setup_loaded, _remove_all) / size * 1000 * 1000
+
+    reset()
+    gc.collect()
+    tracemalloc.start()
+    snapshot = tracemalloc.take_snapshot()
+    mc.add_jobs(lines, save_data=False)
+    gc.collect()
+    size_bytes = sum(stat.size_diff for stat in tracemalloc.take_snapshot().compare_to(snapshot, 'filename'))
+    tracemalloc.stop()
+    results['bytes_per_job'] = size_bytes / size
+    results['index_bytes'] = cs.schedule_index.get_memory()
+    return results
+
+
+def bench_tick(size: int, dense: bool) -> Dict:
+    """ Tick a whole sim day minute by minute, sparse uses the generated jobs, dense runs every job every minute """
+    reset()
+    if dense:
+        lines = [f"* * * * * nop {i} # job{i}" for i in range(size)]
+    else:
+        lines = generate_crontab_lines(size)
+    mc = ManageCrontab()
+    mc.add_jobs(lines, save_data=False)
+    for job in CrontabStore().cron_jobs.values():
+        job.callback = _nop
+
+    env = HeadlessEnvironment()
+    Scheduler.env = env
+    scheduler = Scheduler()
+    Scheduler.t_last_run = env.get_absolute_minute()
+    max_ms_per_tick, max_jobs_per_tick = scheduler.budget()
+    scheduler.budget(0, 0)
+    process_times: List[float] = []
+    run_times: List[float] = []
+    for _ in range(24 * 60):
+        env.advance(1)
+        t = time.perf_counter()
+        # noinspection PyProtectedMember
+        scheduler._process_next_time()
+        t_process = time.perf_counter()
+        # noinspection PyProtectedMember
+        scheduler._run_job_queue()
+        t_run = time.perf_counter()
+        process_times.append(t_process - t)
+        run_times.append(t_run - t_process)
+    scheduler.budget(max_ms_per_tick, max_jobs_per_tick)
+    jobs = Scheduler.queue_data.get('jobs')
+    process_times.sort()
+    run_times.sort()
+    return {
+        'jobs_per_day': jobs,
+        'process_us_mean': sum(process_times) / len(process_times) * 1000 * 1000,
+        'process_us_p95': process_times[int(len(process_times) * 0.95)] * 1000 * 1000,
+        'run_us_mean': sum(run_times) / len(run_times) * 1000 * 1000,
+        'run_us_per_job': sum(run_times) / max(1, jobs) * 1000 * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parsing, indexing and tick dispatch")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000], help="Number of crontab lines")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per measurement, the best one is reported")
+    parser.add_argument('--output', help="Write the JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    results = {
+        'version': ModInfo.get_identity().version,
+        'python': platform.python_version(),
+        'parse_time': bench_parse_time(args.repeat),
+        'sizes': dict(),
+    }
+    for size in args.sizes:
+        results['sizes'][size] = {
+            'parse': bench_parse(size, args.repeat),
+            'index': bench_index(size, args.repeat),
+            'tick_sparse': bench_tick(size, dense=False),
+            'tick_dense': bench_tick(size, dense=True),
+        }
+
+    data = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'wt', encoding='UTF-8') as fp:
+            fp.write(data)
+    else:
+        print(data)
+
+
+if __name__ == '__main__':
+    main()
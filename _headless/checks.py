@@ -0,0 +1,548 @@
+#
+# License: https://creativecommons.org/licenses/by/4.0/ https://creativecommons.org/licenses/by/4.0/legalcode
+# © 2023 https://github.com/Oops19
+#
+
+"""
+Behaviour checks of the schedule index, the scheduler and the crontab files.
+No game installation is needed, a failed check raises an AssertionError.
+
+python _headless/checks.py
+"""
+
+
+import io
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from contextlib import redirect_stdout
+from typing import Callable, Dict, List
+
+import stubs
+from run import generate_crontab_lines
+from benchmark import reset
+from environment import HeadlessEnvironment
+from crontab.catch_up import CatchUp
+from crontab.enums.constants import CrontabConstant
+from crontab.job_health import JobHealth
+from crontab.job_pool import JobPool
+from crontab.next_fire import NextFire
+from crontab.scheduler import Scheduler
+from crontab.store.crontab_i import CrontabI
+from crontab.store.crontab_o import CrontabO
+from crontab.store.crontab_snapshot import CrontabSnapshot
+from crontab.store.crontab_store import CrontabStore
+from crontab.store.manage_crontab import ManageCrontab
+from crontab.store.schedule import Schedule
+from crontab.verbosity import Verbosity
+
+
+MINUTES_PER_DAY = CrontabConstant.MINUTES_PER_DAY
+DAYS = [(weekday, weekday % 4, (weekday * 3) % 8) for weekday in range(7)]  # [(weekday, season, moon_phase), ...] to compare the index with
+DAYS += [(0, -1, -1), (3, 2, -1)]  # All seasons and moon phases
+
+
+def _assert_index() -> int:
+    """
+    Compare the schedule index with a brute-force match of the minute, weekday, season and moon phase masks of every job.
+    :return: Number of compared minutes
+    """
+    cs = CrontabStore()
+    index = cs.schedule_index
+    for job_id, job in cs.cron_jobs.items():
+        assert 0 <= job.handle < len(index.job_ids) and index.job_ids[job.handle] == job_id, (job_id, job.handle)
+    assert sorted(job_id for job_id in index.job_ids if job_id is not None) == sorted(cs.cron_jobs.keys())
+    minutes_mask = 0
+    for job in cs.cron_jobs.values():
+        minutes_mask |= job.minute_mask
+    assert index.minutes_mask == minutes_mask
+
+    for weekday, season, moon_phase in DAYS:
+        jobs = [job for job in cs.cron_jobs.values() if job.weekday_mask >> weekday & 1
+                and (season < 0 or job.season_mask >> season & 1) and (moon_phase < 0 or job.moon_phase_mask >> moon_phase & 1)]
+        for t in range(MINUTES_PER_DAY):
+            expected = {job.job_id for job in jobs if job.minute_mask >> t & 1}
+            due = {index.job_ids[handle] for handle in index.iter_bits(index.get_due(t, weekday, season, moon_phase))}
+            assert due == expected, (t, weekday, season, moon_phase, due ^ expected)
+    return len(DAYS) * MINUTES_PER_DAY
+
+
+def _start_scheduler(start_minute: int = 0) -> HeadlessEnvironment:
+    """ :return: A new simulated clock, the scheduler continues from its time without catch-up and wakes up with every interval event """
+    env = Scheduler.env = HeadlessEnvironment(start_minute=start_minute)
+    scheduler = Scheduler()
+    scheduler.alarms(False)
+    scheduler.tick(False)
+    scheduler.reset_time()
+    return env
+
+
+def _tick(env: HeadlessEnvironment, minutes: float = 1):
+    """ Let 'minutes' sim minutes and one interval event pass """
+    env.real_s += Scheduler.base_tick_ms / 1000
+    env.advance(minutes)
+    Scheduler.o19_crontab_run_every_s()
+
+
+def check_index():
+    """ The index matches a brute-force minute match after adding all jobs at once, adding, replacing and removing single jobs """
+    reset()
+    mc = ManageCrontab()
+    mc.add_jobs(generate_crontab_lines(200), save_data=False)
+    _assert_index()
+
+    mc.add_job('15 * Mo,Tu * *', 'nop', job_id='single', save_data=False)
+    mc.add_crontab_line('*/20 6-9 * Winter Full_Moon nop # filtered', save_data=False)
+    _assert_index()
+
+    mc.replace_job('single', '45 12 * * *', 'nop', save_data=False)
+    mc.replace_job('job0', '*/7 8-9 We * *', 'nop', save_data=False)
+    mc.add_crontab_line('0 12 * Summer * nop # job1', save_data=False)  # Same job_id
+    _assert_index()
+
+    for i in range(0, 200, 3):
+        assert mc.remove_job(f"job{i}", save_data=False)
+    assert mc.remove_job('filtered', save_data=False)
+    _assert_index()
+
+    mc.add_jobs(generate_crontab_lines(20, seed=5), save_data=False)  # Reuses the released handles
+    compared = _assert_index()
+    return f"{len(CrontabStore().cron_jobs)} jobs, {compared} minutes compared"
+
+
+def check_remove():
+    """ Removing jobs clears only their bits and releases their handles, removing all jobs leaves an empty index """
+    reset()
+    cs = CrontabStore()
+    index = cs.schedule_index
+    mc = ManageCrontab()
+    job_ids = mc.add_jobs(generate_crontab_lines(100), save_data=False)
+    handles = len(index.job_ids)
+    for job_id in job_ids[::2]:
+        assert mc.remove_job(job_id, save_data=False), job_id
+    assert not mc.remove_job(job_ids[0], save_data=False)
+    _assert_index()
+
+    with mc.transaction():
+        mc.add_crontab_line('0 8 * * * nop # pending', save_data=False)
+        assert mc.remove_job('pending', save_data=False)  # Not indexed yet
+    for job_id in job_ids[1::2]:
+        assert mc.remove_job(job_id, save_data=False), job_id
+    assert not cs.cron_jobs and not index.minutes_mask and not any(index.minute_jobs), "Bits left after removing all jobs"
+    assert not any(any(masks) for masks in (index.weekday_jobs, index.season_jobs, index.moon_phase_jobs, index.catch_up_jobs))
+    assert all(job_id is None for job_id in index.job_ids)
+
+    mc.add_jobs(generate_crontab_lines(100, seed=7), save_data=False)
+    assert len(index.job_ids) == handles, (len(index.job_ids), handles)  # The handles have been reused
+    _assert_index()
+    return f"{len(job_ids)} jobs removed, {handles} handles"
+
+
+def check_budget():
+    """ Jobs over the per-tick budget stay queued in order, the queue state reports them """
+    reset()
+    env = _start_scheduler()
+    mc = ManageCrontab()
+    ran: List[str] = []
+    mc.add_jobs([f"1 0 * * * nop # job{i}" for i in range(25)], save_data=False)
+    for job in CrontabStore().cron_jobs.values():
+        job.callback = lambda *args, _job_id=job.job_id: ran.append(_job_id)
+    scheduler = Scheduler()
+    budget = scheduler.budget()
+    try:
+        scheduler.budget(0, 10)
+        _tick(env)
+        state = Scheduler.get_queue_state()
+        assert len(ran) == 10 and state.get('depth') == 15 and state.get('budget_hits') == 1, (len(ran), state)
+        _tick(env)
+        state = Scheduler.get_queue_state()
+        assert state.get('depth') == 5 and state.get('oldest_minutes') == 1, state
+        _tick(env)
+        assert ran == [f"job{i}" for i in range(25)], ran
+        assert Scheduler.get_queue_state().get('depth') == 0
+    finally:
+        scheduler.budget(*budget)
+    return f"{len(ran)} jobs in 3 ticks, {Scheduler.queue_data.get('budget_hits')} budget hits"
+
+
+def check_generators():
+    """ Generators run one step per tick after the due jobs, further runs are skipped while in-flight and teardown closes them """
+    reset()
+    env = _start_scheduler()
+    mc = ManageCrontab()
+    steps: List[int] = []
+    closed: List[str] = []
+    ran: List[str] = []
+
+    def _job(job_id: str, count: int):
+        try:
+            for step in range(count):
+                steps.append(step)
+                yield
+        finally:
+            closed.append(job_id)
+
+    mc.add_jobs(['1 0 * * * nop # short', '* * * * * nop # endless'] + [f"3 0 * * * nop # job{i}" for i in range(3)], save_data=False)
+    cs = CrontabStore()
+    cs.cron_jobs.get('short').callback = lambda: _job('short', 2)
+    cs.cron_jobs.get('endless').callback = lambda: _job('endless', 1000)
+    for i in range(3):
+        cs.cron_jobs.get(f"job{i}").callback = lambda *args, _job_id=f"job{i}": ran.append(_job_id)
+    scheduler = Scheduler()
+    budget = scheduler.budget()
+    try:
+        scheduler.budget(0, 3)
+        _tick(env)  # Minute 1, both generators are created, no step yet
+        assert not steps and sorted(Scheduler.in_flight.keys()) == ['endless', 'short'], Scheduler.in_flight
+        _tick(env)  # One step each
+        _tick(env)  # Minute 3, the due jobs use the whole budget
+        assert ran == ['job0', 'job1', 'job2'] and steps == [0, 0], (ran, steps)
+        for _ in range(3):
+            _tick(env)
+        assert closed == ['short'] and list(Scheduler.in_flight.keys()) == ['endless'], (closed, Scheduler.in_flight)
+        assert Scheduler.queue_data.get('skipped') >= 5, Scheduler.queue_data  # 'endless' is due every minute
+        scheduler.teardown()
+        assert closed == ['short', 'endless'] and not Scheduler.in_flight and not Scheduler.job_queue, (closed, Scheduler.in_flight)
+    finally:
+        scheduler.budget(*budget)
+    return f"{len(steps)} steps, {Scheduler.queue_data.get('skipped')} runs skipped while in-flight"
+
+
+def _use_data_root() -> str:
+    """ Use an empty temporary folder instead of 'mod_data/'. :return: The folder, remove it after the check """
+    data_root = tempfile.mkdtemp(prefix='o19_checks_')
+    stubs.install(data_root)
+    return data_root
+
+
+def _write(file_name: str, crontab_lines: List[str]):
+    os.makedirs(os.path.dirname(file_name), exist_ok=True)
+    with open(file_name, 'wb') as fp:
+        fp.write(''.join(f"{crontab_line}\r\n" for crontab_line in crontab_lines).encode('UTF-8'))
+
+
+def _get_runs(t_last_run: int, t_now: int) -> Dict[str, List[int]]:
+    """ :return: {'job_id': [t_due, ...], ...} of the jobs due after 't_last_run' up to 't_now' with the calendar of the HeadlessEnvironment """
+    cs = CrontabStore()
+    ctx = HeadlessEnvironment(start_minute=t_now).get_time_context()
+    runs: Dict[str, List[int]] = dict()
+    for t_due, handle in CatchUp(cs.schedule_index).get_due_jobs(t_last_run, ctx, Scheduler.catch_up_minutes):
+        runs.setdefault(cs.schedule_index.job_ids[handle], []).append(t_due)
+    return runs
+
+
+def check_catch_up():
+    """ A time jump from Sunday 0:00 to Wednesday 10:00 with every catch-up policy, a daily job and one on Mondays only """
+    reset()
+    ManageCrontab().add_jobs([
+        '0 8 * * * @catch_up=once nop # once',
+        '0 8 * * * @catch_up=all nop # all',
+        '0 8 * * * @catch_up=skip nop # skip',
+        '0 8 Mo * * @catch_up=all nop # monday',
+        '0 10 * * * @catch_up=skip nop # now',
+    ], save_data=False)
+    t_now = 3 * MINUTES_PER_DAY + 10 * 60
+    runs = _get_runs(0, t_now)
+    assert runs.get('once') == [t_now - 2 * 60], runs.get('once')
+    assert runs.get('all') == [day * MINUTES_PER_DAY + 8 * 60 for day in range(4)], runs.get('all')
+    assert 'skip' not in runs, runs.get('skip')
+    assert runs.get('monday') == [MINUTES_PER_DAY + 8 * 60], runs.get('monday')
+    assert runs.get('now') == [t_now], runs.get('now')  # Due now, not a missed run
+
+    runs = _get_runs(t_now - 30, t_now)  # No time jump, the policies don't apply
+    assert runs == {'now': [t_now]}, runs
+    return f"{sum(len(t) for t in _get_runs(0, t_now).values())} runs after a jump of {t_now} minutes"
+
+
+def check_catch_up_calendar():
+    """ The seasons and moon phases of the missed days are derived from the current ones, with the lengths and offsets of the calendar """
+    reset()
+    ManageCrontab().add_jobs([
+        '0 8 * Winter * @catch_up=all nop # winter',
+        '0 9 * * Full_Moon @catch_up=all nop # full_moon',
+    ], save_data=False)
+    env = HeadlessEnvironment()
+    t_now = 27 * MINUTES_PER_DAY + 10 * 60
+    runs = _get_runs(0, t_now)
+    expected = [day * MINUTES_PER_DAY + 8 * 60 for day in range(28) if env.get_sim_time(day * MINUTES_PER_DAY * env.MS_PER_MINUTE)[2] == 2]
+    assert expected and runs.get('winter') == expected, (runs.get('winter'), expected)
+    expected = [day * MINUTES_PER_DAY + 9 * 60 for day in range(28) if env.get_sim_time(day * MINUTES_PER_DAY * env.MS_PER_MINUTE)[3] == 4]
+    assert expected and runs.get('full_moon') == expected, (runs.get('full_moon'), expected)
+    return f"{len(runs.get('winter'))} winter and {len(runs.get('full_moon'))} full moon runs"
+
+
+def check_snapshot():
+    """ The snapshot is used only for the unchanged file, a modified file with the same size and mtime or a new snapshot version is parsed again """
+    reset()
+    data_root = _use_data_root()
+    try:
+        file_name = os.path.join(CrontabI().ts4f.data_folder, 'crontab.txt')
+        _write(file_name, ['0 8 * * * nop (1, [2, 3]) # a', '0 9 * * * nop # b'])
+        CrontabI().load()
+        snapshot = CrontabSnapshot(file_name)
+        with open(file_name, 'rb') as fp:
+            signature = snapshot.get_signature(file_name, fp.read())
+        cached = snapshot.load(signature)
+        assert cached and [job.job_id for job in cached[0]] == ['a', 'b'], cached
+        assert cached[0][0].args == (1, (2, 3)), cached[0][0].args
+
+        reset()
+        CrontabI().load()  # From the snapshot
+        assert sorted(CrontabStore().cron_jobs.keys()) == ['a', 'b'] and CrontabStore().cron_jobs.get('a').args == (1, (2, 3))
+
+        stat = os.stat(file_name)
+        _write(file_name, ['0 7 * * * nop (1, [2, 3]) # a', '0 9 * * * nop # b'])
+        os.utime(file_name, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        with open(file_name, 'rb') as fp:
+            modified_signature = snapshot.get_signature(file_name, fp.read())
+        assert modified_signature[:2] == signature[:2] and snapshot.load(modified_signature) is None, modified_signature
+        reset()
+        CrontabI().load()
+        job = CrontabStore().cron_jobs.get('a')
+        assert list(CrontabStore().schedule_index.iter_bits(job.minute_mask)) == [7 * 60], job
+
+        snapshot_version = CrontabSnapshot.SNAPSHOT_VERSION
+        CrontabSnapshot.SNAPSHOT_VERSION += 1
+        try:
+            assert snapshot.load(modified_signature) is None
+        finally:
+            CrontabSnapshot.SNAPSHOT_VERSION = snapshot_version
+        assert snapshot.load(modified_signature) is not None
+    finally:
+        shutil.rmtree(data_root, ignore_errors=True)
+    return f"{len(CrontabStore().cron_jobs)} jobs"
+
+
+def check_reload():
+    """ Applying unchanged lines keeps the jobs, their handles and the schedule_version, a changed line is replaced """
+    reset()
+    cs = CrontabStore()
+    mc = ManageCrontab()
+    notified: List[int] = []
+    listener: Callable[[], None] = lambda: notified.append(cs.schedule_version)
+    cs.schedule_listeners.append(listener)
+    try:
+        lines = generate_crontab_lines(200) + ['0 8 * * * nop', '0 9 * * * nop (hello)']
+        file_lines = mc.apply_crontab_lines(lines, dict(), save_data=False)
+        assert len(file_lines) == len(lines) == len(cs.cron_jobs), (len(file_lines), len(lines), len(cs.cron_jobs))
+        handles = {job_id: job.handle for job_id, job in cs.cron_jobs.items()}
+        version = cs.schedule_version
+        notified.clear()
+
+        assert mc.apply_crontab_lines(lines, file_lines, save_data=False) == file_lines
+        assert cs.schedule_version == version and not notified, (version, cs.schedule_version, notified)
+        assert {job_id: job.handle for job_id, job in cs.cron_jobs.items()} == handles
+
+        lines[0] = '0 12 * * * nop # job0'
+        file_lines = mc.apply_crontab_lines(lines, file_lines, save_data=False)
+        assert cs.schedule_version == version + 1 and len(notified) == 1, (version, cs.schedule_version, notified)
+        assert len(file_lines) == len(cs.cron_jobs) == len(handles), (len(file_lines), len(cs.cron_jobs))
+        assert list(cs.schedule_index.iter_bits(cs.cron_jobs.get('job0').minute_mask)) == [12 * 60]
+        assert cs.cron_jobs.get('job0').handle == handles.get('job0')
+    finally:
+        cs.schedule_listeners.remove(listener)
+    return f"{len(file_lines)} lines, schedule_version {cs.schedule_version}"
+
+
+def check_crontab_d():
+    """ A job_id used in several files belongs to the last file, saving rewrites only the files with changed jobs and keeps their other lines """
+    reset()
+    data_root = _use_data_root()
+    try:
+        cs = CrontabStore()
+        crontab_i = CrontabI()
+        main_file_name = crontab_i.file_name
+        mod_file_name = os.path.join(crontab_i.directory, 'mod.txt')
+        main_lines = ['# My jobs', '0 8 * * * nop # shared', '', '0 10 * * * nop # own']
+        _write(main_file_name, main_lines)
+        _write(mod_file_name, ['# Shipped by a mod', '0 9 * * * nop # shared'])
+        with open(mod_file_name, 'rb') as fp:
+            mod_data = fp.read()
+        crontab_i.load()
+        assert list(cs.schedule_index.iter_bits(cs.cron_jobs.get('shared').minute_mask)) == [9 * 60]
+        assert cs.job_files.get('shared') == mod_file_name and cs.job_files.get('own') == main_file_name, cs.job_files
+
+        assert ManageCrontab().replace_job('own', '0 11 * * *', 'nop', save_data=False)
+        CrontabO().save()
+        with open(main_file_name, 'rb') as fp:
+            lines = fp.read().decode('UTF-8').split('\r\n')
+        assert lines[:3] == main_lines[:3] and lines[3].startswith('0 11 ') and lines[3].endswith('# own'), lines
+        with open(mod_file_name, 'rb') as fp:
+            assert fp.read() == mod_data
+
+        crontab_i.reload(force=True)
+        assert list(cs.schedule_index.iter_bits(cs.cron_jobs.get('shared').minute_mask)) == [9 * 60]
+        assert list(cs.schedule_index.iter_bits(cs.cron_jobs.get('own').minute_mask)) == [11 * 60]
+    finally:
+        shutil.rmtree(data_root, ignore_errors=True)
+    return f"{len(CrontabStore().file_lines)} files, {len(CrontabStore().cron_jobs)} jobs"
+
+
+def check_save():
+    """ Changes are saved once after the quiet period or when forced, the file is replaced without leaving a temporary file """
+    reset()
+    data_root = _use_data_root()
+    use_thread = CrontabO.use_thread
+    try:
+        file_name = CrontabI().file_name
+        mc = ManageCrontab()
+        for i in range(3):
+            mc.add_crontab_line(f"{i} 8 * * * nop # job{i}")
+        assert CrontabO.t_dirty and not CrontabO.flush() and not os.path.isfile(file_name), "Saved within the quiet period"
+
+        CrontabO.t_dirty -= CrontabO.write_delay_s
+        assert CrontabO.flush() and not CrontabO.t_dirty and not CrontabO.flush()
+        with open(file_name, 'rb') as fp:
+            lines = fp.read().decode('UTF-8').split('\r\n')
+        assert sorted(line.rsplit('# ', 1)[-1] for line in lines if line) == ['job0', 'job1', 'job2'], lines
+
+        CrontabO.use_thread = True
+        mc.remove_job('job1')
+        CrontabO.t_dirty -= CrontabO.write_delay_s
+        assert CrontabO.flush()
+        mc.add_crontab_line('0 9 * * * nop # job3')
+        assert CrontabO.flush(force=True) and CrontabO._thread is None  # Joined
+        with open(file_name, 'rb') as fp:
+            lines = fp.read().decode('UTF-8').split('\r\n')
+        assert sorted(line.rsplit('# ', 1)[-1] for line in lines if line) == ['job0', 'job2', 'job3'], lines
+        assert os.listdir(os.path.dirname(file_name)) == ['crontab.txt'], os.listdir(os.path.dirname(file_name))
+    finally:
+        CrontabO.use_thread = use_thread
+        CrontabO.t_dirty = 0
+        shutil.rmtree(data_root, ignore_errors=True)
+    return f"write_delay_s={CrontabO.write_delay_s}"
+
+
+def check_health():
+    """ The backoff of a failing job starts with its period, a failing daily job skips every other run, slow runs are logged once per interval """
+    reset()
+    Scheduler.reset_health()
+    env = _start_scheduler()
+    runs: Dict[str, List[int]] = {'hourly': [], 'daily': []}
+
+    def _fail(job_id: str):
+        runs.get(job_id).append(env.get_absolute_minute())
+        raise ValueError(job_id)
+
+    ManageCrontab().add_jobs(['0 * * * * nop # hourly', '0 8 * * * nop # daily'], save_data=False)
+    for job_id in runs.keys():
+        CrontabStore().cron_jobs.get(job_id).callback = lambda _job_id=job_id: _fail(_job_id)
+    with redirect_stdout(io.StringIO()):  # The errors
+        while env.get_absolute_minute() < 6 * MINUTES_PER_DAY:
+            _tick(env, 10)
+    hourly = [t for t in runs.get('hourly') if t < MINUTES_PER_DAY]
+    assert hourly == [60, 120, 240, 480, 960], hourly
+    assert [t // MINUTES_PER_DAY for t in runs.get('daily')] == [0, 1, 3, 5], runs.get('daily')
+    Scheduler.reset_health()
+
+    health = JobHealth(60)
+    messages = [health.on_success(JobHealth.slow_job_ms + 1, t) for t in range(0, 600, 60)]
+    assert messages[0] and not any(messages[1:]) and health.suppressed_logs == 9, messages
+    return f"{len(hourly)} hourly runs on day 0, daily runs on days {[t // MINUTES_PER_DAY for t in runs.get('daily')]}"
+
+
+def check_pool():
+    """ '@thread' jobs run in a worker thread, further runs are skipped while one is pending and the follow-up runs in the main thread """
+    reset()
+    env = _start_scheduler()
+    release = threading.Event()
+    threads: Dict[str, List[int]] = {'worker': [], 'follow_up': []}
+
+    def _work():
+        threads.get('worker').append(threading.get_ident())
+        release.wait(5)
+        return lambda: threads.get('follow_up').append(threading.get_ident())
+
+    ManageCrontab().add_crontab_line('* * * * * @thread nop # worker', save_data=False)
+    CrontabStore().cron_jobs.get('worker').callback = _work
+    rejected = JobPool.stats.get('rejected')
+    try:
+        _tick(env)
+        _tick(env)  # Still pending
+        assert len(JobPool.pending) == 1 and JobPool.stats.get('rejected') == rejected + 1, JobPool.get_data()
+        release.set()
+        for future in list(JobPool.pending.keys()):
+            future.result(5)
+        _tick(env)
+        assert threads.get('follow_up') == [threading.get_ident()], threads
+        assert threads.get('worker') and threading.get_ident() not in threads.get('worker'), threads
+    finally:
+        release.set()
+        for future in list(JobPool.pending.keys()):
+            future.result(5)
+        JobPool.collect()
+        JobPool.done.clear()
+    return f"{len(threads.get('worker'))} worker runs, {JobPool.stats.get('rejected') - rejected} rejected"
+
+
+def check_register():
+    """ Callables registered with a Schedule run without a crontab line, unregister() removes them from the index and handles are not reused """
+    reset()
+    env = _start_scheduler()
+    cs = CrontabStore()
+    mc = ManageCrontab()
+    calls: List[str] = []
+    handle = mc.register(calls.append, Schedule(minutes=[5], hours=[0]), args=('five', ))
+    other_handle = mc.register(lambda: calls.append('even'), mc.parse_schedule('*/2 * * * *'))
+    assert not cs.crontab_lines and not CrontabO.t_dirty, cs.crontab_lines  # Not saved
+    _assert_index()
+
+    for _ in range(5):
+        _tick(env)
+    assert calls == ['even', 'even', 'five'], calls
+    assert mc.unregister(handle) and not mc.unregister(handle)
+    _assert_index()
+    for _ in range(5):
+        _tick(env)
+    assert calls.count('five') == 1 and calls.count('even') == 5, calls
+    assert mc.unregister(other_handle)
+    assert mc.register(calls.append, Schedule()) not in (handle, other_handle)
+    _assert_index()
+    return f"{len(calls)} calls"
+
+
+def check_spread():
+    """ '@spread' and '~' keep the weekday filter and don't move runs past midnight """
+    reset()
+    ManageCrontab().add_jobs([
+        '30 23 Mo * * @spread=120 nop # spread',
+        '~30 23 Mo * * nop # tilde',
+        '0 8 * * * @spread=60 nop # daily',
+    ], save_data=False)
+    cs = CrontabStore()
+    for job_id in ('spread', 'tilde'):
+        job = cs.cron_jobs.get(job_id)
+        minutes = list(cs.schedule_index.iter_bits(job.minute_mask))
+        assert len(minutes) == 1 and 23 * 60 + 30 <= minutes[0] < MINUTES_PER_DAY, (job_id, minutes)
+        assert job.weekday_mask == 1 << 1, (job_id, bin(job.weekday_mask))
+    minutes = list(cs.schedule_index.iter_bits(cs.cron_jobs.get('daily').minute_mask))
+    assert len(minutes) == 1 and 8 * 60 <= minutes[0] < 9 * 60, minutes
+
+    runs = _get_runs(0, 7 * MINUTES_PER_DAY - 1)  # One week, all runs are on Monday (day 1)
+    for job_id in ('spread', 'tilde'):
+        assert [t // MINUTES_PER_DAY for t in runs.get(job_id)] == [1], (job_id, runs.get(job_id))
+
+    fire_times = NextFire().get_next_fire_times('spread', HeadlessEnvironment().get_time_context(), count=2)
+    assert [day_offset for day_offset, _, _ in fire_times] == [1, 8], fire_times
+    return f"spread={cs.cron_jobs.get('spread').minute_mask.bit_length() - 1}, tilde={cs.cron_jobs.get('tilde').minute_mask.bit_length() - 1}"
+
+
+def main():
+    Verbosity.verbosity(Verbosity.OFF)
+    failed = 0
+    for check in (check_index, check_remove, check_budget, check_generators, check_catch_up, check_catch_up_calendar,
+                  check_snapshot, check_reload, check_crontab_d, check_save, check_health, check_pool,
+                  check_register, check_spread):
+        try:
+            print(f"ok   {check.__name__}: {check()}")
+        except AssertionError as e:
+            failed += 1
+            print(f"FAIL {check.__name__}: {e}")
+    reset()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
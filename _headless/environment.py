@@ -0,0 +1,73 @@
+#
+# License: https://creativecommons.org/licenses/by/4.0/ https://creativecommons.org/licenses/by/4.0/legalcode
+# © 2023 https://github.com/Oops19
+#
+
+
+from typing import Any, Callable, List, Tuple
+
+from crontab.environment import CrontabEnvironment
+
+
+class HeadlessEnvironment(CrontabEnvironment):
+    """
+    Simulated sim clock. Day 0 is a Sunday, 'season_offset_days' after the start of the first season and 'moon_phase_offset_days' after the start
+    of the first moon phase. Seasons and moon phases change every 'season_length_days' and 'moon_phase_length_days' days.
+    The defaults differ from the defaults of the scheduler to check that it uses the lengths and the offsets of the game.
+    """
+    MS_PER_MINUTE = 60 * 1000
+
+    def __init__(self, start_minute: int = 0, season_length_days: int = 10, moon_phase_length_days: int = 3,
+                 season_offset_days: int = 4, moon_phase_offset_days: int = 2):
+        self.ms = start_minute * HeadlessEnvironment.MS_PER_MINUTE
+        self.season_length_days = season_length_days
+        self.moon_phase_length_days = moon_phase_length_days
+        self.season_offset_days = season_offset_days
+        self.moon_phase_offset_days = moon_phase_offset_days
+        self.paused = False
+        self.real_s: float = 0  # Simulated real time, advanced by the runner
+        self.alarms: List[List] = []  # [[t_due (ms), owner, callback], ...]
+
+    def advance(self, minutes: float):
+        """ Let 'minutes' sim minutes pass, due alarms fire in order """
+        t_end = self.ms + int(minutes * HeadlessEnvironment.MS_PER_MINUTE)
+        while True:
+            due = [alarm for alarm in self.alarms if alarm[0] <= t_end]
+            if not due:
+                break
+            alarm = min(due, key=lambda _alarm: _alarm[0])
+            self.cancel_alarm(alarm)
+            self.ms = max(self.ms, alarm[0])
+            alarm[2](alarm)
+        self.ms = t_end
+
+    def get_date_and_time(self) -> int:
+        return self.ms
+
+    def get_absolute_minute(self, date_and_time: Any = None) -> int:
+        return (self.ms if date_and_time is None else date_and_time) // HeadlessEnvironment.MS_PER_MINUTE
+
+    def get_sim_time(self, date_and_time: Any = None) -> Tuple[int, int, int, int]:
+        t = self.get_absolute_minute(date_and_time)
+        day = t // (24 * 60)
+        season = ((day + self.season_offset_days) // self.season_length_days) % 4
+        moon_phase = ((day + self.moon_phase_offset_days) // self.moon_phase_length_days) % 8
+        return t % (24 * 60), day % 7, season, moon_phase
+
+    def get_calendar(self, day: int, season: int, moon_phase: int) -> Tuple[int, int, int, int]:
+        return ((day + self.season_offset_days) % self.season_length_days, self.season_length_days,
+                (day + self.moon_phase_offset_days) % self.moon_phase_length_days, self.moon_phase_length_days)
+
+    def get_real_time(self) -> float:
+        return self.real_s
+
+    def game_is_paused(self) -> bool:
+        return self.paused
+
+    def schedule_alarm(self, owner: Any, minutes: int, callback: Callable) -> List:
+        alarm = [self.ms + minutes * HeadlessEnvironment.MS_PER_MINUTE, owner, callback]
+        self.alarms.append(alarm)
+        return alarm
+
+    def cancel_alarm(self, alarm_handle: List):
+        self.alarms = [alarm for alarm in self.alarms if alarm is not alarm_handle]
@@ -0,0 +1,154 @@
+#
+# License: https://creativecommons.org/licenses/by/4.0/ https://creativecommons.org/licenses/by/4.0/legalcode
+# © 2023 https://github.com/Oops19
+#
+
+"""
+Replay a crontab with a simulated sim clock, no game installation is needed.
+Commands are not executed, every job only counts its runs.
+
+python _headless/run.py crontab.txt --days 28 --speed ultra --jump-every 1 --jump-hours 8
+python _headless/run.py --jobs 1000 --alarms --json
+python _headless/run.py --jobs 1000 --speed normal --fixed-tick
+"""
+
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import stubs
+stubs.install(os.path.join(tempfile.gettempdir(), 'o19_headless', 'mod_data'))
+
+from environment import HeadlessEnvironment
+from crontab.scheduler import Scheduler
+from crontab.store.crontab_store import CrontabStore
+from crontab.store.manage_crontab import ManageCrontab
+from crontab.verbosity import Verbosity
+
+
+SPEEDS = {'normal': 1, 'fast': 3, 'ultra': 12}  # Approximate sim minutes per real second
+
+
+def generate_crontab_lines(jobs: int, seed: int = 19) -> List[str]:
+    """ :return: 'jobs' crontab lines with a mix of sparse, hourly, dense and filtered schedules """
+    rnd = random.Random(seed)
+    templates = (
+        lambda: f"{rnd.randint(0, 59)} {rnd.randint(0, 23)} * * *",
+        lambda: f"{rnd.randint(0, 59)} * * * *",
+        lambda: f"*/{rnd.choice((5, 10, 15, 30))} * * * *",
+        lambda: f"{rnd.randint(0, 59)} {rnd.randint(6, 9)}-{rnd.randint(17, 22)} Mo,We,Fr * *",
+        lambda: f"{rnd.randint(0, 59)} {rnd.randint(0, 23)} * {rnd.randint(0, 3)} *",
+        lambda: f"0 {rnd.randint(18, 23)} * * {rnd.randint(0, 7)}",
+        lambda: "* * * * *",
+    )
+    weights = (30, 25, 15, 15, 8, 5, 2)
+    return [f"{rnd.choices(templates, weights)[0]()} nop {i} # job{i}" for i in range(jobs)]
+
+
+def run(crontab_lines: List[str], days: float, minutes_per_tick: float, jump_every_days: float = 0, jump_hours: float = 0,
+        use_alarms: bool = False, start_minute: int = 0, adaptive_tick: bool = True) -> Dict:
+    """
+    Load the lines and call the tick function every 'Scheduler.base_tick_ms' (simulated real time) until 'days' sim days have passed.
+    :param minutes_per_tick: Sim minutes per real second
+    :return: Jobs fired, wall time per tick, wake-ups and index memory
+    """
+    env = HeadlessEnvironment(start_minute=start_minute)
+    Scheduler.env = env
+    scheduler = Scheduler()
+    scheduler.alarms(use_alarms)
+    scheduler.tick(adaptive_tick)
+
+    mc = ManageCrontab()
+    t_load = time.perf_counter()
+    mc.add_jobs(crontab_lines, save_data=False)
+    t_load = time.perf_counter() - t_load
+
+    fired: Dict[str, int] = dict()
+    cs = CrontabStore()
+    for job in cs.cron_jobs.values():
+        def _count(*args, _job_id=job.job_id):
+            fired[_job_id] = fired.get(_job_id, 0) + 1
+        job.callback = _count
+
+    t_end = start_minute + int(days * 24 * 60)
+    t_next_jump = start_minute + jump_every_days * 24 * 60 if jump_every_days > 0 else t_end + 1
+    tick_times: List[float] = []
+    dt_real = Scheduler.base_tick_ms / 1000
+    while env.get_absolute_minute() < t_end:
+        t_tick = time.perf_counter()
+        env.real_s += dt_real
+        env.advance(minutes_per_tick * dt_real)  # Alarms fire here
+        if env.get_absolute_minute() >= t_next_jump:
+            env.advance(jump_hours * 60)
+            t_next_jump += jump_every_days * 24 * 60
+        Scheduler.o19_crontab_run_every_s()
+        tick_times.append(time.perf_counter() - t_tick)
+
+    tick_times.sort()
+    queue_depth, queue_data = Scheduler.get_queue_data()
+    return {
+        'jobs': len(cs.cron_jobs),
+        'load_ms': t_load * 1000,
+        'sim_days': days,
+        'ticks': len(tick_times),
+        'fired': sum(fired.values()),
+        'fired_jobs': len(fired),
+        'tick_ms_mean': sum(tick_times) / max(1, len(tick_times)) * 1000,
+        'tick_ms_p50': tick_times[len(tick_times) // 2] * 1000 if tick_times else 0,
+        'tick_ms_p95': tick_times[int(len(tick_times) * 0.95)] * 1000 if tick_times else 0,
+        'tick_ms_max': tick_times[-1] * 1000 if tick_times else 0,
+        'tick_ms_total': sum(tick_times) * 1000,
+        'wakeups': Scheduler.speed_data.get('wakeups'),
+        'sim_minutes_per_s': Scheduler.speed_data.get('sim_minutes_per_s'),
+        'index_bytes': cs.schedule_index.get_memory(),
+        'queued': queue_depth,
+        'queue': queue_data,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a crontab with a simulated sim clock")
+    parser.add_argument('crontab', nargs='*', help="Crontab files, omit them to use generated jobs")
+    parser.add_argument('--jobs', type=int, default=100, help="Number of generated jobs")
+    parser.add_argument('--days', type=float, default=28, help="Sim days to replay")
+    parser.add_argument('--speed', choices=SPEEDS.keys(), default='ultra')
+    parser.add_argument('--minutes-per-tick', type=float, help="Sim minutes per real second, overrides --speed")
+    parser.add_argument('--jump-every', type=float, default=0, help="Sim days between time jumps (sleeping, skipping time), 0 for none")
+    parser.add_argument('--jump-hours', type=float, default=8, help="Length of a time jump")
+    parser.add_argument('--alarms', action='store_true', help="Use alarms instead of polling")
+    parser.add_argument('--fixed-tick', action='store_true', help="Wake up every 'Scheduler.tick_ms' instead of adapting to the game speed")
+    parser.add_argument('--verbose', action='store_true', help="Print the debug log")
+    parser.add_argument('--json', action='store_true', help="Print the results as JSON")
+    args = parser.parse_args()
+
+    stubs.set_verbose(args.verbose)
+    Verbosity.verbosity(Verbosity.JOBS if args.verbose else Verbosity.OFF)
+    if args.crontab:
+        crontab_lines = []
+        for file_name in args.crontab:
+            with open(file_name, 'rt', encoding='UTF-8') as fp:
+                crontab_lines += fp.read().split('\n')
+    else:
+        crontab_lines = generate_crontab_lines(args.jobs)
+
+    minutes_per_tick = args.minutes_per_tick or SPEEDS.get(args.speed)
+    results = run(crontab_lines, args.days, minutes_per_tick, args.jump_every, args.jump_hours, args.alarms,
+                  adaptive_tick=not args.fixed_tick)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for key, value in results.items():
+            print(f"{key}: {value:.3f}" if isinstance(value, float) else f"{key}: {value}")
+
+
+if __name__ == '__main__':
+    main()
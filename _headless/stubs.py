@@ -0,0 +1,136 @@
+#
+# License: https://creativecommons.org/licenses/by/4.0/ https://creativecommons.org/licenses/by/4.0/legalcode
+# © 2023 https://github.com/Oops19
+#
+
+
+import enum
+import os
+import sys
+import tempfile
+import types
+from typing import Any
+
+
+def _module(name: str, **attributes: Any) -> types.ModuleType:
+    """ Register a module (and its parent packages) unless it is importable. """
+    for i in range(1, name.count('.') + 1):
+        package = name.rsplit('.', i)[0]
+        if package not in sys.modules:
+            sys.modules[package] = types.ModuleType(package)
+            sys.modules[package].__path__ = []
+    module = types.ModuleType(name)
+    module.__dict__.update(attributes)
+    sys.modules[name] = module
+    return module
+
+
+class _CommonLog:
+    def __init__(self, name: str):
+        self.name = name
+        self.enabled = False
+
+    def enable(self):
+        pass
+
+    def debug(self, message: str):
+        if self.enabled:
+            print(f"DEBUG {message}")
+
+    def info(self, message: str):
+        if self.enabled:
+            print(f"INFO {message}")
+
+    def warn(self, message: str):
+        print(f"WARN {message}")
+
+    def error(self, message: str, *args, throw: bool = True, **kwargs):
+        print(f"ERROR {message}")
+
+
+class _CommonLogRegistry:
+    _instance = None
+    _logs = dict()
+
+    @classmethod
+    def get(cls):
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def register_log(self, mod_identity, name: str) -> _CommonLog:
+        return self._logs.setdefault(name, _CommonLog(name))
+
+
+class _CommonModIdentity:
+    def __init__(self, mod_info):
+        self.name = mod_info._name
+        self.author = mod_info._author
+        self.base_namespace = mod_info._base_namespace
+        self.file_path = mod_info._file_path
+        self.version = mod_info._version
+
+
+class _CommonModInfo:
+    _instances = dict()
+
+    @classmethod
+    def get(cls):
+        return cls._instances.setdefault(cls, cls())
+
+    @classmethod
+    def get_identity(cls) -> _CommonModIdentity:
+        return _CommonModIdentity(cls.get())
+
+
+class _CommonIntervalEventRegistry:
+    @staticmethod
+    def run_every(mod_identity, milliseconds: int = 1000):
+        """ Nothing runs on its own, the runner calls the tick function """
+        return lambda function: function
+
+
+class _Singleton(type):
+    _instances = dict()
+
+    def __call__(cls, *args, **kwargs):
+        if cls not in cls._instances:
+            cls._instances[cls] = super().__call__(*args, **kwargs)
+        return cls._instances[cls]
+
+
+class _TS4Folders:
+    data_root = os.path.join(tempfile.gettempdir(), 'o19_headless', 'mod_data')
+
+    def __init__(self, base_namespace: str):
+        self.data_folder = os.path.join(_TS4Folders.data_root, base_namespace)
+        os.makedirs(self.data_folder, exist_ok=True)
+
+
+def install(data_root: str = None):
+    """
+    Provide the few S4CL and TS4Lib classes the scheduler and the store import, only the missing ones are replaced.
+    Game modules (services, seasons, ...) are not provided, the headless environment replaces them.
+    :param data_root: Folder to use instead of 'The Sims 4/mod_data/'
+    """
+    if data_root:
+        _TS4Folders.data_root = data_root
+    stubs = {
+        'sims4communitylib.utils.common_log_registry': {'CommonLog': _CommonLog, 'CommonLogRegistry': _CommonLogRegistry},
+        'sims4communitylib.mod_support.common_mod_info': {'CommonModInfo': _CommonModInfo},
+        'sims4communitylib.events.interval.common_interval_event_service': {'CommonIntervalEventRegistry': _CommonIntervalEventRegistry},
+        'ts4lib.utils.singleton': {'Singleton': _Singleton},
+        'ts4lib.custom_enums.enum_types.custom_enum': {'CustomEnum': enum.IntEnum},
+        'ts4lib.libraries.ts4folders': {'TS4Folders': _TS4Folders},
+    }
+    for name, attributes in stubs.items():
+        try:
+            __import__(name)
+        except ImportError:
+            _module(name, **attributes)
+
+
+def set_verbose(verbose: bool):
+    """ Print the debug messages of the mod """
+    for log in _CommonLogRegistry._logs.values():
+        log.enabled = verbose
@@ -0,0 +1,77 @@
+#
+# License: https://creativecommons.org/licenses/by/4.0/ https://creativecommons.org/licenses/by/4.0/legalcode
+# © 2023 https://github.com/Oops19
+#
+
+
+from typing import List, Tuple
+
+from crontab.enums.catch_up import CrontabCatchUp
+from crontab.enums.constants import CrontabConstant
+from crontab.store.schedule_index import ScheduleIndex
+from crontab.time_context import TimeContext
+
+
+class CatchUp:
+    """
+    Find the jobs due between the last run and now, also if the game time jumped several days ahead.
+    Every day of the span is evaluated with its own weekday, season and moon phase, only minutes with jobs are visited.
+    """
+
+    def __init__(self, index: ScheduleIndex):
+        self.index = index
+
+    def get_due_jobs(self, t_last_run: int, ctx: TimeContext, max_minutes: int) -> List[Tuple[int, int]]:
+        """
+        :param t_last_run: Absolute sim minute of the last run, it is not included
+        :param ctx: The current sim time, the seasons and moon phases of the past days are derived from it
+        :param max_minutes: For longer spans the catch-up policy of the jobs (run once, run all, skip) is applied to the missed runs
+        :return: Chronologically sorted list with [(t_due, handle), ...], t_due is the absolute sim minute
+        """
+        index = self.index
+        minutes_per_day = CrontabConstant.MINUTES_PER_DAY
+        t_now = ctx.absolute_minute
+        day_now = t_now // minutes_per_day
+        t_from = max(t_last_run + 1, t_now - CrontabConstant.CATCH_UP_MAX_DAYS * minutes_per_day)
+
+        due_jobs: List[Tuple[int, int]] = []  # [(t_due, handles), ...]
+        for day in range(t_from // minutes_per_day, day_now + 1):
+            day_mask = index.get_day_mask(*ctx.get_day(day - day_now))
+            if not day_mask:
+                continue
+            day_start = day * minutes_per_day
+            t_start = max(t_from, day_start) - day_start
+            t_end = min(t_now, day_start + minutes_per_day - 1) - day_start
+            minutes_mask = (index.minutes_mask >> t_start) << t_start
+            minutes_mask &= (1 << (t_end + 1)) - 1
+            for t in index.iter_bits(minutes_mask):
+                handles = index.minute_jobs[t] & day_mask
+                if handles:
+                    due_jobs.append((day_start + t, handles))
+
+        if t_now - t_last_run > max_minutes:
+            due_jobs = self._apply_catch_up(due_jobs, t_now)
+        return [(t_due, handle) for t_due, handles in due_jobs for handle in index.iter_bits(handles)]
+
+    def _apply_catch_up(self, due_jobs: List[Tuple[int, int]], t_now: int) -> List[Tuple[int, int]]:
+        """
+        Filter the missed runs (all before 't_now'). RUN_ALL jobs keep all runs, SKIP jobs none.
+        RUN_ONCE jobs keep only their latest missed run and none if they are due at 't_now'.
+        """
+        run_all = self.index.catch_up_jobs[int(CrontabCatchUp.RUN_ALL)]
+        run_once = self.index.catch_up_jobs[int(CrontabCatchUp.RUN_ONCE)]
+        seen = 0
+        if due_jobs and due_jobs[-1][0] == t_now:
+            seen = due_jobs[-1][1]
+        filtered_jobs: List[Tuple[int, int]] = []
+        for t_due, handles in reversed(due_jobs):
+            if t_due == t_now:
+                filtered_jobs.append((t_due, handles))
+                continue
+            once = handles & run_once & ~seen
+            seen |= once
+            handles = (handles & run_all) | once
+            if handles:
+                filtered_jobs.append((t_due, handles))
+        filtered_jobs.reverse()
+        return filtered_jobs
@@ -0,0 +1,12 @@
+#
+# License: https://creativecommons.org/licenses/by/4.0/ https://creativecommons.org/licenses/by/4.0/legalcode
+# © 2023 https://github.com/Oops19
+#
+from ts4lib.custom_enums.enum_types.custom_enum import CustomEnum
+
+
+class CrontabCatchUp(CustomEnum):
+    """ What to do with the runs of a job which were missed during a time jump (sleep, time skip, ...) """
+    RUN_ONCE = 0
+    RUN_ALL = 1
+    SKIP = 2
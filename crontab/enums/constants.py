@@ -10,6 +10,12 @@ class CrontabConstant:
     WEEKDAY_MAX = 6
     SEASON_MAX = 3
     MOON_PHASE_MAX = 7
+    CATCH_UP_MAX = 2
+
+    MINUTES_PER_DAY = 24 * 60
+    SEASON_LENGTH_DAYS = 7  # Default season length, used if the season service provides no season dates
+    MOON_PHASE_LENGTH_DAYS = 1  # Default moon phase length, used until a complete moon phase has been observed
+    CATCH_UP_MAX_DAYS = 28  # Only the last days of a longer time jump are evaluated
 
     WEEKDAY_MAP = {
         'SU': 0,
@@ -42,3 +48,10 @@ class CrontabConstant:
         'THIRD_QUARTER': 6,
         'WANING_CRESCENT': 7,
     }
+
+    # CrontabCatchUp, '@catch_up=once'
+    CATCH_UP_MAP = {
+        'ONCE': 0,
+        'ALL': 1,
+        'SKIP': 2,
+    }
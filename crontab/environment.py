@@ -0,0 +1,151 @@
+#
+# License: https://creativecommons.org/licenses/by/4.0/ https://creativecommons.org/licenses/by/4.0/legalcode
+# © 2023 https://github.com/Oops19
+#
+
+
+import time
+from typing import Any, Callable, Dict, Tuple, Union
+
+from crontab.enums.constants import CrontabConstant
+from crontab.modinfo import ModInfo
+from crontab.time_context import TimeContext
+from sims4communitylib.utils.common_log_registry import CommonLog, CommonLogRegistry
+
+log: CommonLog = CommonLogRegistry.get().register_log(ModInfo.get_identity(), ModInfo.get_identity().name)
+log.enable()
+
+
+try:
+    import services
+    from lunar_cycle.lunar_cycle_service import LunarCycleService
+    from seasons.season_service import SeasonService
+    from sims4communitylib.utils.common_time_utils import CommonTimeUtils
+    from sims4communitylib.utils.time.common_alarm_utils import CommonAlarmUtils
+    from date_and_time import create_time_span
+except:
+    pass
+
+
+class CrontabEnvironment:
+    """
+    Sim time, pause state and alarms for the Scheduler, read from the running game.
+    Assign a subclass to 'Scheduler.env' to run the scheduler with a simulated clock outside the game.
+    """
+    _services: Union[Tuple[Any, Any], None] = None  # (SeasonService, LunarCycleService), resolved once per zone
+    _phases: Dict[str, Tuple[int, int, int]] = dict()  # {'season': (value, start_day, length), 'moon_phase': (...)}, -1 if not seen yet
+
+    def get_date_and_time(self) -> Any:
+        """ :return: The current game time, compared to detect a stalled game time """
+        return CommonTimeUtils.get_current_date_and_time()
+
+    def get_absolute_minute(self, date_and_time: Any = None) -> int:
+        """
+        :param date_and_time: A value returned by get_date_and_time(), None for now
+        :return: Absolute sim minute (minutes since the start of the game)
+        """
+        if date_and_time is None:
+            date_and_time = self.get_date_and_time()
+        return int(date_and_time.absolute_minutes())
+
+    def get_sim_time(self, date_and_time: Any = None) -> Tuple[int, int, int, int]:
+        """
+        :param date_and_time: A value returned by get_date_and_time(), None for now
+        :return: Current minute of the day (0-1439), weekday (0-6), season (0-3 or -1 if unknown) and moon_phase (0-7 or -1 if unknown)
+        """
+        if date_and_time is None:
+            date_and_time = self.get_date_and_time()
+        hour = CommonTimeUtils.get_current_hour(date_and_time) % 24
+        minute = CommonTimeUtils.get_current_minute(date_and_time) % 60
+        weekday = CommonTimeUtils.get_day_of_week(date_and_time) % 7
+        season_service, lunar_cycle_service = self._get_services()
+        try:
+            season = int(season_service.season) % 4 if season_service else -1
+            moon_phase = int(lunar_cycle_service.current_phase) % 8 if lunar_cycle_service else -1
+        except:
+            self.refresh_services()
+            season, moon_phase = -1, -1
+        return hour * 60 + minute, weekday, season, moon_phase
+
+    def get_time_context(self, date_and_time: Any = None) -> TimeContext:
+        """
+        :param date_and_time: A value returned by get_date_and_time(), None for now
+        :return: The sim time, all values are read from the same game time
+        """
+        if date_and_time is None:
+            date_and_time = self.get_date_and_time()
+        minute, weekday, season, moon_phase = self.get_sim_time(date_and_time)
+        absolute_minute = self.get_absolute_minute(date_and_time)
+        calendar = self.get_calendar(absolute_minute // CrontabConstant.MINUTES_PER_DAY, season, moon_phase)
+        return TimeContext(date_and_time, absolute_minute, minute, weekday, season, moon_phase, *calendar)
+
+    def get_calendar(self, day: int, season: int, moon_phase: int) -> Tuple[int, int, int, int]:
+        """
+        The start and the length of the current season are read from the season service, they depend on the season length option of the game.
+        The lunar cycle has no such values, the start of the current moon phase and the phase length are taken from the observed phase changes.
+        Until a change has been seen, the default lengths are used and the phase is assumed to start today.
+        :param day: Absolute sim day of today
+        :param season: Current season (0-3) or -1 if unknown
+        :param moon_phase: Current moon phase (0-7) or -1 if unknown
+        :return: Days since the start of the current season, season length (days), days since the start of the current moon phase, moon phase length (days)
+        """
+        season_day, season_length = self._observe_phase('season', season, 4, day, CrontabConstant.SEASON_LENGTH_DAYS)
+        season_service, _ = self._get_services()
+        if season_service and season >= 0:
+            # noinspection PyBroadException
+            try:
+                season_content = season_service.season_content
+                start_day = int(season_content.start_time.absolute_days())
+                season_length = max(1, int(season_content.end_time.absolute_days()) - start_day)
+                season_day = day - start_day
+            except:
+                pass
+        moon_phase_day, moon_phase_length = self._observe_phase('moon_phase', moon_phase, 8, day, CrontabConstant.MOON_PHASE_LENGTH_DAYS)
+        return season_day, season_length, moon_phase_day, moon_phase_length
+
+    def _observe_phase(self, name: str, value: int, phases: int, day: int, default_length: int) -> Tuple[int, int]:
+        """ :return: Days since the start of the current phase and the length of the phases """
+        _value, start_day, length = self._phases.get(name, (value, -1, default_length))
+        if value != _value or day < start_day:
+            if 0 <= start_day < day and value == (_value + 1) % phases:
+                length = day - start_day  # A complete phase has been seen
+            start_day = day
+        self._phases[name] = (value, start_day, length)
+        phase_day = day - start_day if 0 <= start_day <= day else 0
+        return phase_day, max(length, phase_day + 1)  # The phase lasts at least until today
+
+    def refresh_services(self):
+        """ Resolve the season and lunar cycle services again with the next tick, call it after every zone change """
+        self._services = None
+
+    def _get_services(self) -> Tuple[Any, Any]:
+        if self._services is None:
+            try:
+                season_service: SeasonService = services.season_service()
+            except:
+                season_service = None
+            try:
+                lunar_cycle_service: LunarCycleService = services.lunar_cycle_service()
+            except:
+                lunar_cycle_service = None
+            self._services = (season_service, lunar_cycle_service)
+        return self._services
+
+    def get_real_time(self) -> float:
+        """ :return: Real time in seconds, only differences are used """
+        return time.perf_counter()
+
+    def game_is_paused(self) -> bool:
+        return CommonTimeUtils.game_is_paused()
+
+    def schedule_alarm(self, owner: Any, minutes: int, callback: Callable) -> Any:
+        """
+        :param owner: The owner of the alarm
+        :param minutes: Sim minutes until the alarm fires
+        :param callback: Called with the alarm handle
+        :return: The alarm handle
+        """
+        return CommonAlarmUtils.schedule_alarm(owner, create_time_span(minutes=minutes), callback)
+
+    def cancel_alarm(self, alarm_handle: Any):
+        CommonAlarmUtils.cancel_alarm(alarm_handle)
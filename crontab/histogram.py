@@ -0,0 +1,67 @@
+#
+# License: https://creativecommons.org/licenses/by/4.0/ https://creativecommons.org/licenses/by/4.0/legalcode
+# © 2023 https://github.com/Oops19
+#
+
+
+from math import log2
+from typing import Dict, List
+
+
+class Histogram:
+    """
+    Fixed-size histogram with logarithmic buckets (4 per power of two, about 19 % wide) for non-negative values, negative values are counted as 0.
+    Values below 'resolution' share the first bucket, use 0.001 to record milliseconds with µs resolution.
+    Adding a value is O(1) and the memory doesn't grow, percentiles are estimated with the upper bound of the bucket, count, total and max are exact.
+    """
+    __slots__ = ('resolution', 'buckets', 'count', 'total', 'max', )
+    BUCKETS_PER_OCTAVE = 4
+    BUCKETS = 24 * BUCKETS_PER_OCTAVE  # Values up to 2^24
+
+    def __init__(self, resolution: float = 1):
+        self.resolution = resolution
+        self.buckets: List[int] = [0] * Histogram.BUCKETS
+        self.count: int = 0
+        self.total: float = 0
+        self.max: float = 0
+
+    def add(self, value: float):
+        value = max(0, value)
+        self.buckets[min(Histogram.BUCKETS - 1, int(log2(value / self.resolution + 1) * Histogram.BUCKETS_PER_OCTAVE))] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def copy(self) -> 'Histogram':
+        histogram = Histogram(self.resolution)
+        histogram.buckets = self.buckets.copy()
+        histogram.count = self.count
+        histogram.total = self.total
+        histogram.max = self.max
+        return histogram
+
+    def get_percentile(self, percentile: float) -> float:
+        """
+        :param percentile: 0-100
+        :return: Estimated value below which 'percentile' % of the values are
+        """
+        if not self.count:
+            return 0
+        rank = self.count * percentile / 100
+        seen = 0
+        for i, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank and count:
+                return min(self.max, (2 ** ((i + 1) / Histogram.BUCKETS_PER_OCTAVE) - 1) * self.resolution)
+        return self.max
+
+    def get_data(self) -> Dict[str, float]:
+        """ :return: {'count': n, 'mean': v, 'p50': v, 'p95': v, 'max': v} """
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else 0,
+            'p50': self.get_percentile(50),
+            'p95': self.get_percentile(95),
+            'max': self.max,
+        }
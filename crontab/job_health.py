@@ -0,0 +1,132 @@
+#
+# License: https://creativecommons.org/licenses/by/4.0/ https://creativecommons.org/licenses/by/4.0/legalcode
+# © 2023 https://github.com/Oops19
+#
+
+
+import time
+from typing import Dict, Union
+
+from crontab.enums.constants import CrontabConstant
+from crontab.store.schedule_index import ScheduleIndex
+
+
+class JobHealth:
+    """
+    Watchdog state of a job which failed or was too slow.
+    The first backoff is the period of the job (in sim minutes), every further consecutive failure or slow run doubles it.
+    After 'max_failures' consecutive failures the job is disabled.
+    Identical errors and slow runs are logged at most once per 'error_log_interval_s'.
+    """
+    __slots__ = ('period', 'failures', 'slow_runs', 'total_failures', 'total_slow_runs', 'backoff_until', 'disabled', 'last_error', 'last_ms',
+                 'last_log', 't_last_log', 'suppressed_logs', )
+
+    slow_job_ms: float = 50
+    """ slow_job_ms - Runs and generator steps taking longer are slow, 0 to disable the check """
+    max_failures: int = 10
+    """ max_failures - Disable a job after this number of consecutive failures, 0 to never disable jobs """
+    backoff_minutes: int = 1
+    """ backoff_minutes - Minimum first backoff, jobs running less often start with their period """
+    max_backoff_minutes: int = 24 * 60
+    """ max_backoff_minutes - Maximum backoff, jobs with a long period are still skipped every other run """
+    error_log_interval_s: float = 60
+
+    def __init__(self, period: int = 1):
+        """ :param period: Minutes between two runs of the job, see get_period() """
+        self.period: int = max(1, period)
+        self.failures: int = 0  # Consecutive
+        self.slow_runs: int = 0  # Consecutive
+        self.total_failures: int = 0
+        self.total_slow_runs: int = 0
+        self.backoff_until: int = -1  # Absolute sim minute
+        self.disabled: bool = False
+        self.last_error: str = ''
+        self.last_ms: float = 0
+        self.last_log: str = ''
+        self.t_last_log: float = 0
+        self.suppressed_logs: int = 0
+
+    def is_blocked(self, t_now: int) -> bool:
+        """ :return: True if the job is disabled or in backoff at sim minute 't_now' """
+        return self.disabled or t_now < self.backoff_until
+
+    @staticmethod
+    def get_period(minute_mask: int) -> int:
+        """ :return: Minutes between the two closest runs (also across midnight), max. one day """
+        minutes = list(ScheduleIndex.iter_bits(minute_mask))
+        if not minutes:
+            return CrontabConstant.MINUTES_PER_DAY
+        gaps = [b - a for a, b in zip(minutes, minutes[1:])] + [minutes[0] + CrontabConstant.MINUTES_PER_DAY - minutes[-1]]
+        return min(gaps)
+
+    def on_success(self, dt_ms: float, t_now: int) -> Union[str, None]:
+        """ :return: The warning to log for a slow run or None if the run was fast or the warning is suppressed """
+        self.failures = 0
+        self.last_ms = dt_ms
+        if not 0 < JobHealth.slow_job_ms < dt_ms:
+            self.slow_runs = 0
+            return None
+        self.slow_runs += 1
+        self.total_slow_runs += 1
+        self._backoff(t_now)
+
+        suppressed_logs = self._get_suppressed_logs('slow')
+        if suppressed_logs is None:
+            return None
+        message = f"took {dt_ms:.1f} ms (slow run {self.slow_runs}"
+        if suppressed_logs:
+            message += f", {suppressed_logs} similar warnings suppressed"
+        return message + f", backoff until minute {self.backoff_until})"
+
+    def on_failure(self, error: Exception, dt_ms: float, t_now: int) -> Union[str, None]:
+        """ :return: The message to log or None if it is suppressed """
+        self.failures += 1
+        self.total_failures += 1
+        self.last_ms = dt_ms
+        if 0 < JobHealth.max_failures <= self.failures:
+            self.disabled = True
+        else:
+            self._backoff(t_now)
+
+        self.last_error = f"{error.__class__.__name__}: {error}"
+        suppressed_logs = self._get_suppressed_logs(self.last_error)
+        if suppressed_logs is None:
+            return None
+        message = f"{self.last_error} (failure {self.failures}"
+        if suppressed_logs:
+            message += f", {suppressed_logs} similar errors suppressed"
+        message += ", disabled)" if self.disabled else f", backoff until minute {self.backoff_until})"
+        return message
+
+    def _get_suppressed_logs(self, key: str) -> Union[int, None]:
+        """ :return: None if the message 'key' was logged within 'error_log_interval_s', else the number of messages suppressed since then """
+        t_wall = time.time()
+        if key == self.last_log and not self.disabled and t_wall - self.t_last_log < JobHealth.error_log_interval_s:
+            self.suppressed_logs += 1
+            return None
+        suppressed_logs = self.suppressed_logs
+        self.last_log = key
+        self.t_last_log = t_wall
+        self.suppressed_logs = 0
+        return suppressed_logs
+
+    def is_healthy(self) -> bool:
+        return not self.disabled and not self.failures and not self.slow_runs
+
+    def _backoff(self, t_now: int):
+        penalty = self.failures + self.slow_runs
+        backoff = max(JobHealth.backoff_minutes, self.period)
+        self.backoff_until = t_now + min(max(JobHealth.max_backoff_minutes, 2 * backoff), backoff * 2 ** min(penalty - 1, 20))
+
+    def get_data(self) -> Dict[str, Union[int, float, bool, str]]:
+        return {
+            'period': self.period,
+            'failures': self.failures,
+            'slow_runs': self.slow_runs,
+            'total_failures': self.total_failures,
+            'total_slow_runs': self.total_slow_runs,
+            'backoff_until': self.backoff_until,
+            'disabled': self.disabled,
+            'last_error': self.last_error,
+            'last_ms': self.last_ms,
+        }
@@ -0,0 +1,134 @@
+#
+# License: https://creativecommons.org/licenses/by/4.0/ https://creativecommons.org/licenses/by/4.0/legalcode
+# © 2023 https://github.com/Oops19
+#
+
+
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from types import GeneratorType
+from typing import Any, Callable, Deque, Dict, List, Set, Tuple, Union
+
+from crontab.histogram import Histogram
+
+
+class JobPool:
+    """
+    Bounded worker thread pool for jobs added with '@thread'.
+    These callbacks must not access the game state (no zone, sims, objects or services), they may read and write files or compute data.
+    The results are collected on the main thread with a later tick. A callable returned by a job is called there as a follow-up.
+    """
+    max_workers: int = 2
+    max_pending: int = 32
+    """ max_pending - Submitted jobs which have not been collected yet. Further jobs are skipped until the pool has caught up. """
+
+    pending: Dict[Future, Tuple[str, float]] = dict()  # {future: ('job_id', t_submit), ...}
+    pending_job_ids: Set[str] = set()
+    done: Deque[Tuple[str, Any, Union[Exception, None], float]] = deque()  # [('job_id', result, error, worker_ms), ...]
+    """ done stores the finished jobs until the scheduler processes them within its per-tick budget """
+    discarded: Set[Future] = set()
+    """ discarded stores the jobs submitted before the zone has been left, their results are dropped """
+    stats: Dict[str, int] = {'submitted': 0, 'completed': 0, 'failed': 0, 'rejected': 0, 'max_depth': 0}
+    worker_histogram: Histogram = Histogram(0.001)
+    """ worker_histogram stores the exec times (ms) of the jobs in the worker threads """
+    _executor: Union[ThreadPoolExecutor, None] = None
+
+    @staticmethod
+    def pool(max_workers: int = None, max_pending: int = None) -> Tuple[int, int]:
+        """ Set the number of worker threads and the max number of pending jobs; use None to query the current settings """
+        if max_workers is not None and max(1, max_workers) != JobPool.max_workers:
+            JobPool.max_workers = max(1, max_workers)
+            JobPool.shutdown()  # Submitted jobs continue, the next job creates a new pool
+        if max_pending is not None:
+            JobPool.max_pending = max(1, max_pending)
+        return JobPool.max_workers, JobPool.max_pending
+
+    @staticmethod
+    def submit(job_id: str, function: Callable, args: List) -> bool:
+        """
+        :param job_id: The job
+        :param function: The resolved callback
+        :param args: Arguments of the callback
+        :return: False if the job is still pending or the pool is full
+        """
+        if job_id in JobPool.pending_job_ids or len(JobPool.pending) + len(JobPool.done) >= JobPool.max_pending:
+            JobPool.stats['rejected'] += 1
+            return False
+        if JobPool._executor is None:
+            JobPool._executor = ThreadPoolExecutor(max_workers=JobPool.max_workers, thread_name_prefix='o19_crontab')
+        future = JobPool._executor.submit(JobPool._run, function, args)
+        JobPool.pending.update({future: (job_id, time.perf_counter())})
+        JobPool.pending_job_ids.add(job_id)
+        JobPool.stats['submitted'] += 1
+        JobPool.stats['max_depth'] = max(JobPool.stats['max_depth'], len(JobPool.pending))
+        return True
+
+    @staticmethod
+    def _run(function: Callable, args: List) -> Tuple[Any, Union[Exception, None], float]:
+        # Runs in a worker thread. A generator is exhausted here, there is no need to spread it over the ticks.
+        t_start = time.perf_counter()
+        # noinspection PyBroadException
+        try:
+            result = function(*args)
+            if isinstance(result, GeneratorType):
+                for result in result:
+                    pass
+            return result, None, (time.perf_counter() - t_start) * 1000
+        except Exception as e:
+            return None, e, (time.perf_counter() - t_start) * 1000
+
+    @staticmethod
+    def collect() -> int:
+        """
+        Move the finished jobs to 'done'. Call this on the main thread.
+        :return: Number of finished jobs
+        """
+        finished = [future for future in JobPool.pending if future.done()]
+        for future in finished:
+            job_id, _ = JobPool.pending.pop(future)
+            JobPool.pending_job_ids.discard(job_id)
+            if future in JobPool.discarded:
+                JobPool.discarded.discard(future)
+                continue
+            try:
+                result, error, worker_ms = future.result()
+            except Exception as e:  # Cancelled
+                result, error, worker_ms = None, e, 0
+            JobPool.stats['failed' if error else 'completed'] += 1
+            JobPool.worker_histogram.add(worker_ms)
+            JobPool.done.append((job_id, result, error, worker_ms))
+        return len(finished)
+
+    @staticmethod
+    def discard():
+        """ Drop the results of all submitted jobs, e.g. when the zone is left. Running jobs can't be stopped, their results are dropped when they finish. """
+        JobPool.discarded.update(JobPool.pending.keys())
+        JobPool.done.clear()
+
+    @staticmethod
+    def is_idle() -> bool:
+        """ :return: True if no job is pending or waiting to be processed """
+        return not JobPool.pending and not JobPool.done
+
+    @staticmethod
+    def shutdown(wait: bool = False):
+        """ Stop the worker threads after the submitted jobs. Their results are still collected. """
+        if JobPool._executor is not None:
+            JobPool._executor.shutdown(wait=wait)
+            JobPool._executor = None
+
+    @staticmethod
+    def get_data() -> Dict[str, Any]:
+        """ :return: {'max_workers': n, 'max_pending': n, 'pending': n, 'queued': n, 'done': n, 'submitted': n, ..., 'worker_ms': {...}} """
+        queued = sum(1 for future in JobPool.pending if not future.running() and not future.done())
+        data = {'max_workers': JobPool.max_workers, 'max_pending': JobPool.max_pending,
+                'pending': len(JobPool.pending), 'queued': queued, 'done': len(JobPool.done)}
+        data.update(JobPool.stats)
+        data.update({'worker_ms': JobPool.worker_histogram.get_data()})
+        return data
+
+    @staticmethod
+    def reset_profiling_data():
+        JobPool.stats = {'submitted': 0, 'completed': 0, 'failed': 0, 'rejected': 0, 'max_depth': 0}
+        JobPool.worker_histogram = Histogram(0.001)
@@ -1,11 +1,16 @@
 from crontab.modinfo import ModInfo
+from crontab.profiling_export import ProfilingExport
 from crontab.scheduler import Scheduler
 from crontab.store.crontab_i import CrontabI
+from crontab.store.crontab_o import CrontabO
 
 from crontab.store.crontab_store import CrontabStore
 from crontab.store.manage_crontab import ManageCrontab
+from crontab.verbosity import Verbosity
 from sims4communitylib.events.event_handling.common_event_registry import CommonEventRegistry
 from sims4communitylib.events.zone_spin.events.zone_late_load import S4CLZoneLateLoadEvent
+from sims4communitylib.events.zone_spin.events.zone_save import S4CLZoneSaveEvent
+from sims4communitylib.events.zone_spin.events.zone_teardown import S4CLZoneTeardownEvent
 from sims4communitylib.utils.common_log_registry import CommonLog, CommonLogRegistry
 
 log: CommonLog = CommonLogRegistry.get().register_log(ModInfo.get_identity(), ModInfo.get_identity().name)
@@ -19,12 +24,30 @@ class Main:
     @staticmethod
     @CommonEventRegistry.handle_events(ModInfo.get_identity())
     def handle_event(event_data: S4CLZoneLateLoadEvent):
+        Scheduler.env.refresh_services()
         cs = CrontabStore()
         if not cs.is_initialized:
-            log.debug(f"Starting {ModInfo.get_identity().name}")
+            if Verbosity.level >= Verbosity.SUMMARY:
+                log.debug(f"Starting {ModInfo.get_identity().name}")
             CrontabI().load()
             ManageCrontab().add_job("0 * * * *", "crontab.scheduler.Scheduler.log_profiling_data", job_id="profiler", save_data=False)
+            Scheduler.interval_listeners.append(ProfilingExport.on_interval)
             Scheduler()
             cs.is_initialized = True
+        else:
+            scheduler = Scheduler()
+            scheduler.reset_time()  # Another save may have been loaded
+            scheduler.start()  # Alarms don't survive the zone change
 
+    @staticmethod
+    @CommonEventRegistry.handle_events(ModInfo.get_identity())
+    def handle_save_event(event_data: S4CLZoneSaveEvent):
+        CrontabO.flush(force=True)
 
+    @staticmethod
+    @CommonEventRegistry.handle_events(ModInfo.get_identity())
+    def handle_teardown_event(event_data: S4CLZoneTeardownEvent):
+        Scheduler.env.refresh_services()
+        Scheduler().teardown()
+        CrontabO.flush(force=True)
+        ProfilingExport.flush(wait=True)
@@ -0,0 +1,100 @@
+#
+# License: https://creativecommons.org/licenses/by/4.0/ https://creativecommons.org/licenses/by/4.0/legalcode
+# © 2023 https://github.com/Oops19
+#
+
+
+from math import gcd
+from typing import List, Tuple, Union
+
+from crontab.enums.constants import CrontabConstant
+from crontab.modinfo import ModInfo
+from crontab.store.crontab_store import CrontabStore
+from crontab.time_context import TimeContext
+
+from sims4communitylib.utils.common_log_registry import CommonLog, CommonLogRegistry
+
+log: CommonLog = CommonLogRegistry.get().register_log(ModInfo.get_identity(), ModInfo.get_identity().name)
+log.enable()
+
+
+class NextFire:
+    """
+    Calculate the next fire times of the cron jobs with the schedule index, empty minutes and days without matching jobs are skipped.
+    Weekdays are exact. Seasons and moon phases of other days are estimated from the current ones and the season and moon phase lengths of the game.
+    """
+
+    def __init__(self):
+        self.cs = CrontabStore()
+
+    @staticmethod
+    def get_period(ctx: TimeContext) -> int:
+        """ :return: Number of days after which weekdays, seasons and moon phases repeat """
+        period = 7
+        for days in (4 * max(1, ctx.season_length), 8 * max(1, ctx.moon_phase_length)):
+            period = period * days // gcd(period, days)
+        return period
+
+    def get_next_fire_times(self, job_id: Union[str, None], ctx: TimeContext, count: int = 10) -> List[Tuple[int, int, str]]:
+        """
+        Calculate the next fire times of one job or of all jobs.
+        :param job_id: The job to check, None for all jobs
+        :param ctx: The current sim time, only later minutes are returned for today
+        :param count: Maximum number of fire times to return
+        :return: Sorted list with [(day_offset, minute, 'job_id'), ...]. day_offset is 0 for today.
+        """
+        index = self.cs.schedule_index
+        if job_id is None:
+            job_mask = -1  # All bits set
+            minutes_mask = index.minutes_mask
+        else:
+            job = self.cs.cron_jobs.get(job_id)
+            if not job:
+                return []
+            job_mask = 1 << job.handle
+            minutes_mask = job.minute_mask
+
+        fire_times: List[Tuple[int, int, str]] = []
+        if not minutes_mask or count <= 0:
+            return fire_times
+        t_now = ctx.minute
+        for day_offset in range(self.get_period(ctx) + 1):
+            day_mask = index.get_day_mask(*ctx.get_day(day_offset)) & job_mask
+            if not day_mask:
+                continue
+            mask = minutes_mask if day_offset else (minutes_mask >> (t_now + 1)) << (t_now + 1)
+            for t in index.iter_bits(mask):
+                for handle in index.iter_bits(index.minute_jobs[t] & day_mask):
+                    fire_times.append((day_offset, t, index.job_ids[handle]))
+                    if len(fire_times) >= count:
+                        return fire_times
+        return fire_times
+
+    def get_minute_load(self, ctx: TimeContext, day_offset: int = 0) -> List[Tuple[int, int]]:
+        """
+        Count the jobs which run at every minute of a day, e.g. to check how well '~' and '@spread' distribute the jobs.
+        :param ctx: The current sim time
+        :param day_offset: Days from today
+        :return: [(minute, jobs), ...] for all minutes of the day with jobs
+        """
+        index = self.cs.schedule_index
+        day_mask = index.get_day_mask(*ctx.get_day(day_offset))
+        load: List[Tuple[int, int]] = []
+        if not day_mask:
+            return load
+        for t in index.iter_bits(index.minutes_mask):
+            jobs = bin(index.minute_jobs[t] & day_mask).count('1')
+            if jobs:
+                load.append((t, jobs))
+        return load
+
+    @staticmethod
+    def format_fire_time(day_offset: int, t: int, weekday: int) -> str:
+        """
+        :param day_offset: Days from today
+        :param t: Minute of the day (0-1439)
+        :param weekday: Current weekday (0-6)
+        :return: Fire time as 'Day+1 Mo 04:30'
+        """
+        weekday_names = {v: k for k, v in CrontabConstant.WEEKDAY_MAP.items()}
+        return f"Day+{day_offset} {weekday_names.get((weekday + day_offset) % 7, '?').capitalize()} {t // 60:02}:{t % 60:02}"
@@ -0,0 +1,166 @@
+#
+# License: https://creativecommons.org/licenses/by/4.0/ https://creativecommons.org/licenses/by/4.0/legalcode
+# © 2023 https://github.com/Oops19
+#
+
+
+import csv
+import io
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Tuple, Union
+
+from crontab.histogram import Histogram
+from crontab.modinfo import ModInfo
+from crontab.scheduler import Scheduler
+from sims4communitylib.utils.common_log_registry import CommonLog, CommonLogRegistry
+from sims4communitylib.utils.common_log_utils import CommonLogUtils
+
+log: CommonLog = CommonLogRegistry.get().register_log(ModInfo.get_identity(), ModInfo.get_identity().name)
+log.enable()
+
+
+class ProfilingExport:
+    """
+    Append profiling snapshots to 'mod_logs/Crontab_Profiling.jsonl' (one JSON object per snapshot) or '.csv' (one row per job and tick metric).
+    A snapshot only copies the counters and histograms, it is taken with the interval event of the scheduler.
+    Percentiles, serialization and I/O happen once per 'batch_size' snapshots in a worker thread.
+    The values are cumulative since the profiling data was reset.
+    """
+    interval_s: float = 0
+    """ interval_s - Seconds between two snapshots, 0 to disable the export """
+    file_format = 'jsonl'  # 'jsonl' or 'csv'
+    batch_size: int = 12
+    """ batch_size - Snapshots to collect before they are written """
+    max_bytes: int = 5 * 1024 * 1024
+    """ max_bytes - The file is rotated to '.1', '.2', ... when it gets larger """
+    backups: int = 3
+    use_thread = True
+    """ use_thread - Serialize and write the snapshots in a background thread """
+
+    t_last_snapshot: float = 0
+    snapshots: List[Tuple] = []
+    _thread: Union[threading.Thread, None] = None
+
+    @staticmethod
+    def export(interval_s: float = None, file_format: str = None) -> Tuple[float, str]:
+        """ Set the interval (0 to disable) and the file format ('jsonl' or 'csv'); use None to query the current settings """
+        if file_format is not None and file_format.lower() in ('jsonl', 'csv') and file_format.lower() != ProfilingExport.file_format:
+            ProfilingExport.flush()
+            ProfilingExport.file_format = file_format.lower()
+        if interval_s is not None:
+            ProfilingExport.interval_s = max(0.0, interval_s)
+            if not ProfilingExport.interval_s:
+                ProfilingExport.flush()
+        return ProfilingExport.interval_s, ProfilingExport.file_format
+
+    @staticmethod
+    def get_file_name() -> str:
+        return os.path.join(CommonLogUtils.get_mod_logs_location_path(), f"{ModInfo.get_identity().name}_Profiling.{ProfilingExport.file_format}")
+
+    @staticmethod
+    def take_snapshot():
+        """ Copy the current profiling data, this is cheap enough for the tick """
+        ProfilingExport.snapshots.append((
+            time.time(),
+            Scheduler.t_last_run,
+            Scheduler.schedules,
+            Scheduler.duration,
+            len(Scheduler.job_queue),
+            len(Scheduler.in_flight),
+            Scheduler.get_queue_state(),
+            {job_id: histogram.copy() for job_id, histogram in Scheduler.cron_job_histograms.items()},
+            {name: histogram.copy() for name, histogram in Scheduler.tick_histograms.items()},
+        ))
+        if len(ProfilingExport.snapshots) >= ProfilingExport.batch_size:
+            ProfilingExport.flush()
+
+    @staticmethod
+    def flush(wait: bool = False):
+        """
+        Write the collected snapshots.
+        :param wait: Write them in this thread even if 'use_thread' is set and wait for a running write, use it when the zone is left
+        """
+        snapshots = ProfilingExport.snapshots
+        ProfilingExport.snapshots = []
+        thread = ProfilingExport._thread
+        if thread and (wait or snapshots):
+            thread.join()
+            ProfilingExport._thread = None
+        if not snapshots:
+            return
+        args = (ProfilingExport.get_file_name(), ProfilingExport.file_format, snapshots)
+        if ProfilingExport.use_thread and not wait:
+            ProfilingExport._thread = threading.Thread(target=ProfilingExport._write, args=args, daemon=True)
+            ProfilingExport._thread.start()
+        else:
+            ProfilingExport._write(*args)
+
+    @staticmethod
+    def _write(file_name: str, file_format: str, snapshots: List[Tuple]):
+        try:
+            ProfilingExport._rotate(file_name)
+            if file_format == 'csv':
+                data = ProfilingExport._to_csv(snapshots, not os.path.isfile(file_name))
+            else:
+                data = ''.join(f"{json.dumps(ProfilingExport._to_dict(snapshot))}\n" for snapshot in snapshots)
+            with open(file_name, 'at', encoding='UTF-8', newline='') as fp:
+                fp.write(data)
+        except Exception as e:
+            log.error(f"Couldn't write {file_name} ({e})", throw=False)
+
+    @staticmethod
+    def _rotate(file_name: str):
+        if not os.path.isfile(file_name) or os.path.getsize(file_name) < ProfilingExport.max_bytes:
+            return
+        for i in range(ProfilingExport.backups - 1, 0, -1):
+            if os.path.isfile(f"{file_name}.{i}"):
+                os.replace(f"{file_name}.{i}", f"{file_name}.{i + 1}")
+        if ProfilingExport.backups > 0:
+            os.replace(file_name, f"{file_name}.1")
+        else:
+            os.remove(file_name)
+
+    @staticmethod
+    def _to_dict(snapshot: Tuple) -> Dict:
+        t, t_sim, schedules, duration, queued, in_flight, queue_data, job_histograms, tick_histograms = snapshot
+        return {
+            'time': t,
+            'sim_minute': t_sim,
+            'schedules': schedules,
+            'duration': duration,
+            'queued': queued,
+            'in_flight': in_flight,
+            'queue': queue_data,
+            'ticks': {name: histogram.get_data() for name, histogram in tick_histograms.items()},
+            'jobs': {job_id: histogram.get_data() for job_id, histogram in job_histograms.items()},
+        }
+
+    @staticmethod
+    def _to_csv(snapshots: List[Tuple], header: bool) -> str:
+        """ One row per job and tick metric, tick metrics use the job_id '#name' """
+        fp = io.StringIO()
+        writer = csv.writer(fp, lineterminator='\n')
+        if header:
+            writer.writerow(('time', 'sim_minute', 'queued', 'in_flight', 'job_id', 'count', 'mean', 'p50', 'p95', 'max'))
+        for t, t_sim, _, _, queued, in_flight, _, job_histograms, tick_histograms in snapshots:
+            rows: Dict[str, Histogram] = {f"#{name}": histogram for name, histogram in tick_histograms.items()}
+            rows.update(job_histograms)
+            for job_id, histogram in rows.items():
+                data = histogram.get_data()
+                writer.writerow((f"{t:.3f}", t_sim, queued, in_flight, job_id, data['count'],
+                                 f"{data['mean']:.4f}", f"{data['p50']:.4f}", f"{data['p95']:.4f}", f"{data['max']:.4f}"))
+        return fp.getvalue()
+
+    @staticmethod
+    def on_interval():
+        """ Take a snapshot every 'interval_s' seconds, add it to 'Scheduler.interval_listeners' """
+        if not ProfilingExport.interval_s or not Scheduler.profiling_enabled:
+            return
+        t_now = Scheduler.env.get_real_time()
+        if 0 <= t_now - ProfilingExport.t_last_snapshot < ProfilingExport.interval_s:
+            return
+        ProfilingExport.t_last_snapshot = t_now
+        ProfilingExport.take_snapshot()
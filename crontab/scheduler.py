@@ -5,48 +5,196 @@
 
 
 import time
-from typing import List, Dict, Any
+from collections import deque
+from types import GeneratorType
+from typing import Callable, List, Dict, Deque, Tuple, Generator, Union
 
+from crontab.catch_up import CatchUp
+from crontab.environment import CrontabEnvironment
+from crontab.histogram import Histogram
+from crontab.job_health import JobHealth
+from crontab.job_pool import JobPool
 from crontab.modinfo import ModInfo
+from crontab.store.crontab_i import CrontabI
+from crontab.store.crontab_o import CrontabO
 from crontab.store.crontab_store import CrontabStore
+from crontab.time_context import TimeContext
+from crontab.verbosity import Verbosity
 from ts4lib.utils.singleton import Singleton
 
 from sims4communitylib.events.interval.common_interval_event_service import CommonIntervalEventRegistry
 from sims4communitylib.utils.common_log_registry import CommonLog, CommonLogRegistry
 
-import services
-
 log: CommonLog = CommonLogRegistry.get().register_log(ModInfo.get_identity(), ModInfo.get_identity().name)
 log.enable()
 
 
-try:
-    from lunar_cycle.lunar_cycle_service import LunarCycleService
-    from seasons.season_service import SeasonService
-    from sims4communitylib.utils.common_time_utils import CommonTimeUtils
-    from sims4communitylib.utils.time.common_alarm_utils import CommonAlarmUtils
-except:
-    pass
-
-
 class Scheduler(object, metaclass=Singleton):
     """
     Class to actually process the crontab entries
     """
 
-    t_last_run = -1
+    env: CrontabEnvironment = CrontabEnvironment()
+    """ env provides sim time, pause state and alarms, the game by default. Replace it before the Scheduler is created. """
+
+    t_last_run = -1  # Absolute sim minute
     date_and_time = -1
+    time_context: TimeContext = None
+    """ time_context stores the sim time of the last tick which processed a new minute """
+
+    catch_up_minutes = 60
+    """ catch_up_minutes - If more sim minutes passed since the last run the catch-up policy of the jobs is applied to the missed runs """
+
+    use_alarms = False
+    """ use_alarms arms one sim-time alarm for the next due minute instead of polling every second """
+    alarm_housekeeping_s: float = 10
+    """ alarm_housekeeping_s - Real seconds between the crontab file checks and saves in the alarm mode, they also run with every alarm """
+    t_last_housekeeping: float = 0  # Real time (s)
+
+    base_tick_ms = 1000
+    """ base_tick_ms - Interval of the game's interval event. The scheduler wakes up with the first event at 't_next_tick', other events only check for crontab changes. """
+    tick_ms: float = 1000
+    """ tick_ms - Wake interval if adaptive_tick is disabled, the speed is unknown or jobs are queued """
+    adaptive_tick = True
+    """ adaptive_tick - Skip the events until the next due sim minute, based on the observed sim minutes per real second """
+    min_tick_ms: float = 1000
+    max_tick_ms: float = 5000
+    t_next_tick: float = 0  # Real time (s) of the next wake up
+    t_minute_start: float = 0  # Real time (s) when the current sim minute was seen first
+    speed_sample: Union[Tuple[float, int], None] = None  # (real time (s), absolute sim minute)
+    speed_data: Dict[str, float] = {'sim_minutes_per_s': 0, 'interval_ms': 0, 'wakeups': 0, 'idle': 0}
+    """ speed_data stores the observed sim minutes per real second, the current wake interval and the number of wake-ups and idle events """
+
+    max_ms_per_tick: float = 10  # 0 for no limit
+    max_jobs_per_tick: int = 0  # 0 for no limit
+    job_queue: Deque[Tuple] = deque()  # [(cron_job, t_due, t_queued), ...]
+    """ job_queue stores the due jobs, they are run in order within the per-tick budget """
+    in_flight: Dict[str, Generator] = dict()  # {'job_id': generator, ...}
+    """ in_flight stores the generators returned by jobs, they are resumed one step per tick until exhausted """
 
     profiling_enabled = True
     schedules: int = 0  # may store the number of runs
     duration: float = 0  # may store the exec time of the main method
     cron_job_execs_times: Dict[str, List] = dict()  # {'job_id': ['executions', 'duration'], ...}
     """ cron_job_execs_times may store the exec times """
+    cron_job_histograms: Dict[str, Histogram] = dict()  # {'job_id': Histogram, ...}
+    """ cron_job_histograms may store the exec times (ms) of every run and generator step to find the jobs causing spikes """
+    tick_histograms: Dict[str, Histogram] = dict()  # {'tick_ms': Histogram, 'minutes': Histogram, 'jobs': Histogram, 'lag_minutes': Histogram}
+    """ tick_histograms may store the duration (ms), the processed sim minutes and the run jobs per tick and the sim minutes between due time and run """
+    job_health: Dict[str, JobHealth] = dict()  # {'job_id': JobHealth, ...}
+    """ job_health stores the watchdog state of the jobs which failed or were too slow, they are skipped while in backoff or disabled """
+    cron_job_step_times: Dict[str, List] = dict()  # {'job_id': ['steps', 'duration', 'completions'], ...}
+    """ cron_job_step_times may store the exec times of the in-flight generator jobs """
+    interval_listeners: List[Callable[[], None]] = list()
+    """ interval_listeners are called after the crontab files have been checked, e.g. to export the profiling data.
+    With every interval event while polling, every 'alarm_housekeeping_s' and with every alarm in the alarm mode. """
+    queue_data: Dict[str, float] = {'max_depth': 0, 'jobs': 0, 'skipped': 0, 'lag': 0, 'max_lag': 0, 'max_lag_minutes': 0, 'budget_hits': 0}
+    """ queue_data may store the max queue depth, the number of queued and skipped jobs, the (max) real time lag (s) and sim time lag (minutes)
+    and the number of ticks which used up the budget before the queue was empty """
 
     def __init__(self):
-        Scheduler.t_last_run, _, _, _ = self._get_current_sim_time()
-        # self._alarm_handle = None
-        # self.start(granularity=1)
+        Scheduler.t_last_run = self._get_current_absolute_minute()
+        self._alarm_handle = None
+        self.cs = CrontabStore()
+        self.cs.schedule_listeners.append(self.start)
+        self.start()
+
+    def reset_time(self):
+        """
+        Continue from the current sim time without catch-up. Call this after every zone load, the loaded save may have a later clock than the
+        previous one and the difference is no time jump.
+        """
+        Scheduler.t_last_run = self._get_current_absolute_minute()
+        Scheduler.job_queue.clear()  # Due with the clock of the previous zone
+        Scheduler.date_and_time = -1
+        Scheduler.speed_sample = None
+        Scheduler.t_next_tick = 0
+
+    def teardown(self):
+        """
+        Drop the work of the zone which is left, it must not continue with the objects of the next zone. Call this on zone teardown.
+        The in-flight generators are closed, the queued jobs and the follow-ups of the '@thread' jobs are dropped and the alarm is cancelled.
+        """
+        self.stop()
+        Scheduler.job_queue.clear()
+        for job_id, generator in list(Scheduler.in_flight.items()):
+            # noinspection PyBroadException
+            try:
+                generator.close()  # Runs the 'finally' blocks of the job
+            except Exception as e:
+                log.error(f"Couldn't close '{job_id}' ({e})", throw=False)
+        Scheduler.in_flight.clear()
+        JobPool.discard()
+
+    def alarms(self, use_alarms: bool = None) -> bool:
+        """ En-/Disable the alarm mode; use None to query the current settings """
+        if use_alarms is not None:
+            Scheduler.use_alarms = use_alarms
+            self.start()
+        return Scheduler.use_alarms
+
+    def start(self):
+        """
+        (Re-)arm the alarm for the next due minute. Alarms do not survive a zone change, call this after every zone load.
+        Only the alarm is cancelled while polling.
+        """
+        self.stop()
+        if not Scheduler.use_alarms:
+            return
+        t_now, _, _, _ = self._get_current_sim_time()
+        minutes = self.cs.schedule_index.get_minutes_until_next_job(t_now)
+        if minutes is None:
+            return  # Nothing scheduled, adding a job calls start() again
+        try:
+            self._alarm_handle = Scheduler.env.schedule_alarm(self, minutes, self._on_alarm)
+            if Verbosity.level >= Verbosity.JOBS:
+                log.debug(f"Alarm armed for t={(t_now + minutes) % (24 * 60)} (in {minutes} minutes)")
+        except Exception as e:
+            log.error(f"Oops: '{e}'", throw=False)
+
+    def stop(self):
+        """ Cancel the alarm, if any """
+        if self._alarm_handle is not None:
+            try:
+                Scheduler.env.cancel_alarm(self._alarm_handle)
+            except Exception as e:
+                log.error(f"Oops: '{e}'", throw=False)
+            self._alarm_handle = None
+
+    def _on_alarm(self, _alarm_handle=None):
+        self._alarm_handle = None
+        if Scheduler.use_alarms:
+            Scheduler._housekeeping(Scheduler.env.get_real_time())
+            self._process_next_time()
+            self._run_job_queue()
+            self.start()
+
+    def budget(self, max_ms_per_tick: float = None, max_jobs_per_tick: int = None) -> Tuple[float, int]:
+        """ Set the per-tick budget (0 for no limit); use None to query the current settings """
+        if max_ms_per_tick is not None:
+            Scheduler.max_ms_per_tick = max(0.0, max_ms_per_tick)
+        if max_jobs_per_tick is not None:
+            Scheduler.max_jobs_per_tick = max(0, max_jobs_per_tick)
+        return Scheduler.max_ms_per_tick, Scheduler.max_jobs_per_tick
+
+    def tick(self, adaptive_tick: bool = None, min_tick_ms: float = None, max_tick_ms: float = None) -> Tuple[bool, float, float]:
+        """
+        Set the adaptive wake interval and its bounds (ms); use None to query the current settings.
+        The adaptive mode can only lengthen the interval, the scheduler wakes up with the interval event every 'base_tick_ms' at most.
+        A ValueError is raised for bounds below 'base_tick_ms' or a max. below the min. interval.
+        """
+        _min_tick_ms = Scheduler.min_tick_ms if min_tick_ms is None else min_tick_ms
+        _max_tick_ms = Scheduler.max_tick_ms if max_tick_ms is None else max_tick_ms
+        if _min_tick_ms < Scheduler.base_tick_ms:
+            raise ValueError(f"min_tick_ms must be at least {Scheduler.base_tick_ms} ms, the interval of the game's interval event")
+        if _max_tick_ms < _min_tick_ms:
+            raise ValueError(f"max_tick_ms must be at least min_tick_ms ({_min_tick_ms} ms)")
+        if adaptive_tick is not None:
+            Scheduler.adaptive_tick = adaptive_tick
+        Scheduler.min_tick_ms = _min_tick_ms
+        Scheduler.max_tick_ms = _max_tick_ms
+        Scheduler.t_next_tick = 0
+        return Scheduler.adaptive_tick, Scheduler.min_tick_ms, Scheduler.max_tick_ms
 
     def profiling(self, enable_profiling: bool = None) -> bool:
         """ En-/Disable profiling; use None to query the current settings """
@@ -57,110 +205,429 @@ class Scheduler(object, metaclass=Singleton):
     @staticmethod
     def log_profiling_data():
         #  {'profiler': [2, 0.007950067520141602]}
+        if Verbosity.level < Verbosity.SUMMARY:
+            return
         log.debug(f"Profiling data: TOTAL: [{Scheduler.schedules} runs, {Scheduler.duration:0.3f} s]")
         log.debug(f"Profiling data: {Scheduler.cron_job_execs_times}")
+        log.debug(f"Profiling data: QUEUE: {Scheduler.get_queue_state()}")
+        log.debug(f"Profiling data: IN-FLIGHT: [{len(Scheduler.in_flight)} running, {Scheduler.cron_job_step_times}]")
+        log.debug(f"Profiling data: TICKS: {Scheduler.get_profiling_data(detailed=True).get('ticks')}")
+        log.debug(f"Profiling data: HEALTH: {Scheduler.get_health_data()}")
+        log.debug(f"Profiling data: POOL: {JobPool.get_data()}")
+        log.debug(f"Profiling data: SPEED: {Scheduler.speed_data}")
+
+    @staticmethod
+    def get_profiling_data(detailed: bool = False):
+        """
+        :param detailed: Return the histograms of the jobs and ticks
+        :return: (schedules, duration, {'job_id': [executions, duration], ...}) or for 'detailed' a dict with
+        {'schedules': n, 'duration': s, 'jobs': {'job_id': {'count': n, 'mean': ms, 'p50': ms, 'p95': ms, 'max': ms}, ...}, 'ticks': {'tick_ms': {...}, ...},
+        'queue': {'depth': n, 'in_flight': n, 'oldest_s': s, 'oldest_minutes': n, 'max_depth': n, 'budget_hits': n, ...},
+        'health': {...}, 'pool': {'max_workers': n, 'pending': n, 'queued': n, ...}, 'speed': {'sim_minutes_per_s': n, 'interval_ms': ms, ...}}
+        """
+        if not detailed:
+            return Scheduler.schedules, Scheduler.duration, Scheduler.cron_job_execs_times
+        return {
+            'schedules': Scheduler.schedules,
+            'duration': Scheduler.duration,
+            'jobs': {job_id: histogram.get_data() for job_id, histogram in Scheduler.cron_job_histograms.items()},
+            'ticks': {name: histogram.get_data() for name, histogram in Scheduler.tick_histograms.items()},
+            'queue': Scheduler.get_queue_state(),
+            'health': Scheduler.get_health_data(),
+            'pool': JobPool.get_data(),
+            'speed': dict(Scheduler.speed_data),
+        }
+
+    @staticmethod
+    def _add_to_histogram(histograms: Dict[str, Histogram], key: str, value: float, resolution: float = 1):
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = Histogram(resolution)
+        histogram.add(value)
+
+    @staticmethod
+    def get_queue_state() -> Dict[str, float]:
+        """ :return: Current queue depth, in-flight generators, real time (s) and sim minutes since the oldest queued job was due and the queue statistics """
+        job_queue = Scheduler.job_queue
+        state = {
+            'depth': len(job_queue),
+            'in_flight': len(Scheduler.in_flight),
+            'oldest_s': time.perf_counter() - job_queue[0][2] if job_queue else 0,
+            'oldest_minutes': max(0, Scheduler.t_last_run - job_queue[0][1]) if job_queue else 0,
+        }
+        state.update(Scheduler.queue_data)
+        return state
+
+    @staticmethod
+    def get_queue_data() -> Tuple[int, Dict[str, float]]:
+        """ :return: Current queue depth and the queue statistics """
+        return len(Scheduler.job_queue), Scheduler.queue_data
 
     @staticmethod
-    def get_profiling_data():
-        return Scheduler.schedules, Scheduler.duration, Scheduler.cron_job_execs_times
+    def get_in_flight_data() -> Tuple[List[str], Dict[str, List]]:
+        """ :return: Job IDs of the in-flight generator jobs and their step statistics """
+        return list(Scheduler.in_flight.keys()), Scheduler.cron_job_step_times
 
     @staticmethod
     def reset_profiling_data():
         Scheduler.schedules = 0
         Scheduler.duration = 0
         Scheduler.cron_job_execs_times = dict()
+        Scheduler.cron_job_histograms = dict()
+        Scheduler.tick_histograms = dict()
+        Scheduler.cron_job_step_times = dict()
+        Scheduler.queue_data = {'max_depth': 0, 'jobs': 0, 'skipped': 0, 'lag': 0, 'max_lag': 0, 'max_lag_minutes': 0, 'budget_hits': 0}
+        Scheduler.speed_data.update({'wakeups': 0, 'idle': 0})
+        JobPool.reset_profiling_data()
 
-    def _get_current_sim_time(self):
+    def _get_current_sim_time(self) -> Tuple[int, int, int, int]:
         """
-        :return: Current minute of the day (0-1439), weekday (0-7), season (0-3) and moon_phase (0-7)
+        :return: Current minute of the day (0-1439), weekday (0-6), season (0-3) and moon_phase (0-7)
         """
         try:
-            ctu = CommonTimeUtils()
-            date_and_time = ctu.get_current_date_and_time()
-            hour = ctu.get_current_hour(date_and_time) % 24
-            minute = ctu.get_current_minute(date_and_time) % 60
-            weekday = ctu.get_day_of_week(date_and_time) % 7
-            # log.debug(f"w {weekday}")
-            try:
-                # log.debug(f"s: {type(services.season_service().season)} = {int(services.season_service().season)}")
-                season_service: SeasonService = services.season_service()
-                season = int(season_service.season) % 4
-            except:
-                season = -1
-            try:
-                lunar_cycle_service: LunarCycleService = services.lunar_cycle_service()
-                moon_phase = int(lunar_cycle_service.current_phase) % 8
-            except:
-                moon_phase = -1
-            return hour * 60 + minute, weekday, season, moon_phase
+            return Scheduler.env.get_sim_time()
         except Exception as e:
             log.error(f"Oops: '{e}'", throw=False)
             return 0, 0, 0, 0
 
+    def _get_current_absolute_minute(self) -> int:
+        """
+        :return: Current absolute sim minute (minutes since the start of the game)
+        """
+        try:
+            return Scheduler.env.get_absolute_minute()
+        except Exception as e:
+            log.error(f"Oops: '{e}'", throw=False)
+            return -1
+
     def _process_next_time(self):
-        t_call = time.time()
+        t_call = time.perf_counter()
 
-        def _do_job(_t: int, _weekday: int, _season: int, _moon_phase: int):
-            cs = CrontabStore()
-            job_ids = cs.cron_job_schedules.get(_t, [])
-            if not job_ids:
-                return
-            log.debug(f"Checking t={_t}, wd={_weekday}, s={_season}, mp={_moon_phase} --> '{job_ids}'")
-            _job_queue: Dict[Any, List] = dict()
-            for job_id in job_ids:
-                function, arguments, weekdays, seasons, moon_phases = cs.cron_jobs.get(job_id)
-                if (_weekday in weekdays) and (_season in seasons or _season == -1) and (_moon_phase in moon_phases or moon_phase == -1):
-                    # Make sure to run every job only one time, no matter how big the time jump is (if any)
-                    _job_queue.update({job_id: [function, arguments]})
-            for job_id, (function, arguments) in _job_queue.items():
-                t_job = time.time()
-                # noinspection PyBroadException
-                try:
-                    log.debug(f"{function}({arguments})")
-                    function(*arguments)
-                except Exception as e:
-                    log.warn(f"Error in '{function}({arguments})'")
-                    log.error(f"{e}")
-                if Scheduler.profiling_enabled:
-                    dt_job = time.time() - t_job
-                    executions, duration = Scheduler.cron_job_execs_times.get(job_id, [0, 0])
-                    executions += 1
-                    duration += dt_job
-                    Scheduler.cron_job_execs_times.update({job_id: [executions, duration]})
-
-        ctu = CommonTimeUtils()
-        date_and_time = ctu.get_current_date_and_time()
-        if date_and_time > Scheduler.date_and_time:
-            Scheduler.date_and_time = date_and_time
-        else:
-            # Game time went backwards or is stalled: Do nothing
+        env = Scheduler.env
+        date_and_time = env.get_date_and_time()
+        if date_and_time == Scheduler.date_and_time:
+            # Game time is stalled: Do nothing
             return
+        Scheduler.date_and_time = date_and_time
 
-        t_now, weekday, season, moon_phase = self._get_current_sim_time()  # t_now is 0..1439
+        t_now = env.get_absolute_minute(date_and_time)
         t_last_run = Scheduler.t_last_run
+        if t_now <= t_last_run:
+            # Same minute or the game time went backwards (e.g. another save has been loaded): Continue from now
+            Scheduler.t_last_run = t_now
+            return
+        if t_last_run < 0:
+            t_last_run = t_now - 1
 
-        if t_now > t_last_run:
-            # execute all jobs between last_run and now
-            for t in range(t_last_run + 1, t_now + 1):
-                _do_job(t, weekday, season, moon_phase)
-        elif t_now < t_last_run:
-            # execute all jobs between last_run and now, after switch from 23:59 to 00:00 (or 23:57 to 0:04)
-            for t in range(t_last_run + 1, 24 * 60):
-                _do_job(t, weekday, season, moon_phase)
-            for t in range(0, t_now + 1):
-                _do_job(t, weekday, season, moon_phase)
-        else:
-            return  # should be handled by CommonTimeUtils above
+        # One game time value for all values of this tick
+        ctx = Scheduler.time_context = env.get_time_context(date_and_time)
+        cs = self.cs
+        index = cs.schedule_index
+        # Every job is queued only one time per minute. After a time jump the catch-up policy of the job applies.
+        due_jobs = CatchUp(index).get_due_jobs(t_last_run, ctx, Scheduler.catch_up_minutes)
+        cron_jobs = cs.cron_jobs
+        job_ids = index.job_ids
+        job_queue = Scheduler.job_queue
+        for t_due, handle in due_jobs:
+            job_queue.append((cron_jobs.get(job_ids[handle]), t_due, t_call))
+        if due_jobs:
+            if Verbosity.level >= Verbosity.JOBS:
+                log.debug(f"Checking t={t_last_run + 1}..{t_now}, wd={ctx.weekday}, s={ctx.season}, mp={ctx.moon_phase} --> {len(due_jobs)} jobs")
+            if Scheduler.profiling_enabled:
+                Scheduler.queue_data['jobs'] += len(due_jobs)
+                Scheduler.queue_data['max_depth'] = max(Scheduler.queue_data['max_depth'], len(Scheduler.job_queue))
         Scheduler.t_last_run = t_now
 
         if Scheduler.profiling_enabled:
-            dt_call = time.time() - t_call
+            Scheduler._add_to_histogram(Scheduler.tick_histograms, 'minutes', t_now - t_last_run)
+            dt_call = time.perf_counter() - t_call
             Scheduler.schedules += 1
             Scheduler.duration += dt_call
 
+    def _run_job_queue(self):
+        """
+        Process the jobs finished in the JobPool, run the queued jobs in order and resume the in-flight generator jobs by one step until the
+        per-tick budget is used up. At least one job, step or follow-up is run per call.
+        """
+        job_queue = Scheduler.job_queue
+        in_flight = Scheduler.in_flight
+        if not job_queue and not in_flight and JobPool.is_idle():
+            return
+        t_call = time.perf_counter()
+        t_end = t_call + Scheduler.max_ms_per_tick / 1000 if Scheduler.max_ms_per_tick > 0 else 0
+        jobs = 0
+
+        # Results of the '@thread' jobs. The worker time does not count as main thread time, only the follow-up callbacks do.
+        JobPool.collect()
+        while JobPool.done and not ((0 < Scheduler.max_jobs_per_tick <= jobs) or (0 < t_end <= time.perf_counter())):
+            job_id, result, error, worker_ms = JobPool.done.popleft()
+            if error is not None:
+                self._on_job_failure(job_id, error, worker_ms)
+                continue
+            if not callable(result):
+                self._on_job_success(job_id, 0)
+                continue
+            t_job = time.perf_counter()
+            # noinspection PyBroadException
+            try:
+                if Verbosity.level >= Verbosity.JOBS:
+                    log.debug(f"Follow-up of '{job_id}': {result}()")
+                result()
+                t_done = time.perf_counter()
+                self._on_job_success(job_id, (t_done - t_job) * 1000)
+            except Exception as e:
+                t_done = time.perf_counter()
+                self._on_job_failure(job_id, e, (t_done - t_job) * 1000)
+            if Scheduler.profiling_enabled:
+                Scheduler._add_to_histogram(Scheduler.cron_job_histograms, job_id, (t_done - t_job) * 1000, 0.001)
+            jobs += 1
+
+        # The due jobs run first, the in-flight generators use the rest of the budget. Long generators don't delay the due jobs,
+        # they continue when the queue is empty. Generators returned by queued jobs are resumed starting with the next tick.
+        generators = list(in_flight.items())
+        jobs = self._run_queued_jobs(jobs, t_end)
+        jobs = self._step_in_flight(generators, jobs, t_end)
+        if job_queue:
+            if Verbosity.level >= Verbosity.JOBS:
+                log.debug(f"Budget used up after {jobs} jobs, {len(job_queue)} jobs queued")
+            if Scheduler.profiling_enabled:
+                Scheduler.queue_data['budget_hits'] += 1
+
+        if Scheduler.profiling_enabled:
+            dt_call = time.perf_counter() - t_call
+            Scheduler.duration += dt_call
+            Scheduler._add_to_histogram(Scheduler.tick_histograms, 'tick_ms', dt_call * 1000, 0.001)
+            Scheduler._add_to_histogram(Scheduler.tick_histograms, 'jobs', jobs)
+
+    def _step_in_flight(self, generators: List[Tuple[str, Generator]], jobs: int, t_end: float) -> int:
+        """
+        Resume the in-flight generator jobs by one step until the per-tick budget is used up.
+        Jobs which are not exhausted move to the end to continue with the next job in the next tick.
+        :param generators: [('job_id', generator), ...] in-flight at the start of the tick
+        :param jobs: Jobs and steps run in this tick
+        :param t_end: perf_counter() value at which the time budget is used up, 0 for no limit
+        :return: Jobs and steps run in this tick
+        """
+        in_flight = Scheduler.in_flight
+        for job_id, generator in generators:
+            if (0 < Scheduler.max_jobs_per_tick <= jobs) or (0 < t_end <= time.perf_counter()):
+                break
+            t_job = time.perf_counter()
+            del in_flight[job_id]
+            error = None
+            # noinspection PyBroadException
+            try:
+                next(generator)
+                in_flight.update({job_id: generator})
+                completed = 0
+            except StopIteration:
+                completed = 1
+            except Exception as e:
+                completed = 1
+                error = e
+            t_done = time.perf_counter()
+            if error is None:
+                self._on_job_success(job_id, (t_done - t_job) * 1000)
+            else:
+                self._on_job_failure(job_id, error, (t_done - t_job) * 1000)
+            if Scheduler.profiling_enabled:
+                steps, duration, completions = Scheduler.cron_job_step_times.get(job_id, [0, 0, 0])
+                Scheduler.cron_job_step_times.update({job_id: [steps + 1, duration + t_done - t_job, completions + completed]})
+                Scheduler._add_to_histogram(Scheduler.cron_job_histograms, job_id, (t_done - t_job) * 1000, 0.001)
+            jobs += 1
+
+        return jobs
+
+    def _run_queued_jobs(self, jobs: int, t_end: float) -> int:
+        """
+        Run the queued jobs in order until the per-tick budget is used up.
+        :param jobs: Jobs and steps run in this tick
+        :param t_end: perf_counter() value at which the time budget is used up, 0 for no limit
+        :return: Jobs and steps run in this tick
+        """
+        job_queue = Scheduler.job_queue
+        in_flight = Scheduler.in_flight
+        while job_queue and not ((0 < Scheduler.max_jobs_per_tick <= jobs) or (0 < t_end <= time.perf_counter())):
+            job, t_due, t_queued = job_queue.popleft()
+            job_id = job.job_id
+            if job_id in in_flight:
+                if Verbosity.level >= Verbosity.JOBS:
+                    log.debug(f"Skipping '{job_id}', it is still in-flight")
+                if Scheduler.profiling_enabled:
+                    Scheduler.queue_data['skipped'] += 1
+                continue
+            health = Scheduler.job_health.get(job_id)
+            if health and health.is_blocked(Scheduler.t_last_run):
+                if Verbosity.level >= Verbosity.JOBS:
+                    log.debug(f"Skipping '{job_id}', it is {'disabled' if health.disabled else 'in backoff'}")
+                if Scheduler.profiling_enabled:
+                    Scheduler.queue_data['skipped'] += 1
+                continue
+            t_job = time.perf_counter()
+            arguments = job.args
+            try:
+                # The first run of a job imports its callback, failed imports are cached and not retried
+                function = job.get_callback()
+            except Exception:
+                if Verbosity.level >= Verbosity.JOBS:
+                    log.debug(f"Skipping '{job_id}', '{job.callback_path}' can't be resolved")
+                if Scheduler.profiling_enabled:
+                    Scheduler.queue_data['skipped'] += 1
+                jobs += 1
+                continue
+            if job.threaded:
+                if not JobPool.submit(job_id, function, arguments):
+                    if Verbosity.level >= Verbosity.JOBS:
+                        log.debug(f"Skipping '{job_id}', it is still running in the pool or the pool is full")
+                    if Scheduler.profiling_enabled:
+                        Scheduler.queue_data['skipped'] += 1
+                    continue
+                t_done = time.perf_counter()
+            else:
+                # noinspection PyBroadException
+                try:
+                    if Verbosity.level >= Verbosity.JOBS:
+                        log.debug(f"{function}({arguments})")
+                    result = function(*arguments)
+                    if isinstance(result, GeneratorType):
+                        # Resumed one step per tick, starting with the next tick
+                        in_flight.update({job_id: result})
+                    t_done = time.perf_counter()
+                    self._on_job_success(job_id, (t_done - t_job) * 1000)
+                except Exception as e:
+                    t_done = time.perf_counter()
+                    self._on_job_failure(job_id, e, (t_done - t_job) * 1000)
+            if Scheduler.profiling_enabled:
+                dt_job = t_done - t_job
+                executions, duration = Scheduler.cron_job_execs_times.get(job_id, [0, 0])
+                executions += 1
+                duration += dt_job
+                Scheduler.cron_job_execs_times.update({job_id: [executions, duration]})
+                Scheduler._add_to_histogram(Scheduler.cron_job_histograms, job_id, dt_job * 1000, 0.001)
+                lag = t_job - t_queued
+                Scheduler.queue_data['lag'] += lag
+                Scheduler.queue_data['max_lag'] = max(Scheduler.queue_data['max_lag'], lag)
+                lag_minutes = max(0, Scheduler.t_last_run - t_due)  # Negative if the clock has been set back
+                Scheduler.queue_data['max_lag_minutes'] = max(Scheduler.queue_data['max_lag_minutes'], lag_minutes)
+                Scheduler._add_to_histogram(Scheduler.tick_histograms, 'lag_minutes', lag_minutes)
+            jobs += 1
+        return jobs
+
+    def _on_job_success(self, job_id: str, dt_ms: float):
+        health = Scheduler.job_health.get(job_id)
+        if health is None:
+            if not 0 < JobHealth.slow_job_ms < dt_ms:
+                return
+            health = Scheduler.job_health[job_id] = self._create_health(job_id)
+        message = health.on_success(dt_ms, Scheduler.t_last_run)
+        if message:
+            log.warn(f"'{job_id}' {message}")
+
+    def _on_job_failure(self, job_id: str, error: Exception, dt_ms: float):
+        health = Scheduler.job_health.get(job_id)
+        if health is None:
+            health = Scheduler.job_health[job_id] = self._create_health(job_id)
+        message = health.on_failure(error, dt_ms, Scheduler.t_last_run)
+        if message:
+            log.error(f"Error in '{job_id}': {message}", throw=False)
+
+    def _create_health(self, job_id: str) -> JobHealth:
+        """ :return: A new JobHealth with the period of the job, backoffs of hourly or daily jobs skip at least one run """
+        job = self.cs.cron_jobs.get(job_id)
+        return JobHealth(JobHealth.get_period(job.minute_mask) if job else 1)
+
+    def _update_speed(self, t_real: float):
+        """
+        Measure the sim minutes per real second over at least 5 sim minutes or 5 seconds, the minute resolution makes shorter samples inaccurate.
+        Pauses and time jumps restart the measurement.
+        """
+        sample = Scheduler.speed_sample
+        t_now = Scheduler.t_last_run
+        if sample is None or t_now < sample[1] or t_now - sample[1] > Scheduler.catch_up_minutes or t_real - sample[0] > 2 * Scheduler.max_tick_ms / 1000:
+            Scheduler.speed_sample = (t_real, t_now)
+            return
+        dt_real = t_real - sample[0]
+        minutes = t_now - sample[1]
+        if minutes < 5 and dt_real < 5:
+            return
+        ratio = minutes / dt_real
+        old_ratio = Scheduler.speed_data['sim_minutes_per_s']
+        Scheduler.speed_data['sim_minutes_per_s'] = ratio if old_ratio <= 0 else (old_ratio + ratio) / 2
+        Scheduler.speed_sample = (t_real, t_now)
+
+    def _get_tick_interval(self, t_real: float) -> float:
+        """
+        :param t_real: Current real time (s)
+        :return: Milliseconds until the next wake-up, right after the next due sim minute has started.
+        The start of the current minute is known with the accuracy of the last interval, waking up too early costs one more wake-up.
+        """
+        if not Scheduler.adaptive_tick:
+            return Scheduler.tick_ms
+        ratio = Scheduler.speed_data['sim_minutes_per_s']
+        if Scheduler.job_queue or Scheduler.in_flight or not JobPool.is_idle() or ratio <= 0:
+            interval = Scheduler.tick_ms
+        else:
+            minutes = self.cs.schedule_index.get_minutes_until_next_job(Scheduler.t_last_run % (24 * 60))
+            interval = Scheduler.max_tick_ms if minutes is None else (Scheduler.t_minute_start + minutes / ratio - t_real) * 1000
+        return min(max(interval, Scheduler.min_tick_ms), Scheduler.max_tick_ms)
+
+    @staticmethod
+    def get_health_data() -> Dict[str, Dict]:
+        """ :return: {'job_id': {'failures': n, 'slow_runs': n, ..., 'disabled': bool}, ...} for all jobs which failed or were too slow """
+        return {job_id: health.get_data() for job_id, health in Scheduler.job_health.items()}
+
+    @staticmethod
+    def reset_health(job_id: str = None) -> int:
+        """
+        Enable the job(s) again and clear the backoff.
+        :param job_id: The job to reset, None for all jobs
+        :return: Number of reset jobs
+        """
+        if job_id is None:
+            count = len(Scheduler.job_health)
+            Scheduler.job_health = dict()
+            return count
+        return 0 if Scheduler.job_health.pop(job_id, None) is None else 1
+
     @staticmethod
-    @CommonIntervalEventRegistry.run_every(ModInfo.get_identity(), milliseconds=1000)
+    def _housekeeping(t_real: float):
+        """ Reload the changed crontab files, save the pending changes and notify the interval_listeners """
+        Scheduler.t_last_housekeeping = t_real
+        CrontabI.check()
+        CrontabO.flush()
+        for listener in Scheduler.interval_listeners:
+            listener()
+
+    @staticmethod
+    @CommonIntervalEventRegistry.run_every(ModInfo.get_identity(), milliseconds=base_tick_ms)
     def o19_crontab_run_every_s():
-        if CommonTimeUtils.game_is_paused():
+        env = Scheduler.env
+        t_real = env.get_real_time()
+        if Scheduler.use_alarms:
+            # The alarms run the jobs, the event only works off the queue and does the housekeeping every 'alarm_housekeeping_s'
+            if not 0 <= t_real - Scheduler.t_last_housekeeping < Scheduler.alarm_housekeeping_s:
+                Scheduler._housekeeping(t_real)
+            if not Scheduler.job_queue and not Scheduler.in_flight and JobPool.is_idle():
+                return
+        else:
+            Scheduler._housekeeping(t_real)
+        if t_real + Scheduler.base_tick_ms / 2000 < Scheduler.t_next_tick:  # Events are not exactly 'base_tick_ms' apart
+            Scheduler.speed_data['idle'] += 1
+            return
+        if env.game_is_paused():
+            Scheduler.speed_sample = None
             return
-        Scheduler()._process_next_time()
+        scheduler = Scheduler()
+        if not Scheduler.use_alarms:
+            t_last_run = Scheduler.t_last_run
+            scheduler._process_next_time()
+            if Scheduler.t_last_run != t_last_run:
+                Scheduler.t_minute_start = t_real
+            scheduler._update_speed(t_real)
+        scheduler._run_job_queue()
+        interval = scheduler._get_tick_interval(t_real)
+        Scheduler.t_next_tick = t_real + interval / 1000
+        Scheduler.speed_data['interval_ms'] = interval
+        Scheduler.speed_data['wakeups'] += 1
+        if Scheduler.profiling_enabled:
+            Scheduler._add_to_histogram(Scheduler.tick_histograms, 'interval_ms', interval)
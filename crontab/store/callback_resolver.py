@@ -0,0 +1,49 @@
+#
+# LICENSE https://creativecommons.org/licenses/by/4.0/ https://creativecommons.org/licenses/by/4.0/legalcode
+# © 2023 https://github.com/Oops19
+#
+
+
+import importlib
+from typing import Dict, Callable, Union
+
+from crontab.modinfo import ModInfo
+from sims4communitylib.utils.common_log_registry import CommonLog, CommonLogRegistry
+
+log: CommonLog = CommonLogRegistry.get().register_log(ModInfo.get_identity(), ModInfo.get_identity().name)
+log.enable()
+
+
+class CallbackResolver:
+    """
+    Resolve 'module.Class.method' strings to callables.
+    Results (also errors) are cached by the dotted path, jobs with the same callback import the module only once.
+    """
+    cache: Dict[str, Union[Callable, Exception]] = dict()  # {'module.Class.method': callable or the exception, ...}
+
+    @staticmethod
+    def resolve(callback: str) -> Callable:
+        """
+        :param callback: 'module.Class.method'
+        :return: The callable, an exception is raised if it can't be resolved
+        """
+        _function = CallbackResolver.cache.get(callback)
+        if _function is None:
+            try:
+                _class_string, _function_name = callback.rsplit('.', 1)
+                _module_name, _class_name = _class_string.rsplit('.', 1)
+                _class = getattr(importlib.import_module(_module_name), _class_name)
+                _function = getattr(_class, _function_name)
+            except Exception as e:
+                log.error(f"Error '{e} - Could not resolve '{callback}'", throw=False)
+                #  'module 'crontab.ui' has no attribute 'CrontabUI' - Could not resolve 'crontab.ui.CrontabUI.nop'
+                _function = e
+            CallbackResolver.cache.update({callback: _function})
+        if isinstance(_function, Exception):
+            raise _function
+        return _function
+
+    @staticmethod
+    def clear_cache():
+        """ Retry failed callbacks, e.g. after installing a missing mod """
+        CallbackResolver.cache = dict()
@@ -0,0 +1,69 @@
+#
+# LICENSE https://creativecommons.org/licenses/by/4.0/ https://creativecommons.org/licenses/by/4.0/legalcode
+# © 2023 https://github.com/Oops19
+#
+
+
+from types import MappingProxyType
+from typing import Any, Callable, Tuple, Union
+
+from crontab.enums.catch_up import CrontabCatchUp
+from crontab.store.callback_resolver import CallbackResolver
+
+
+class CronJob:
+    """
+    A registered cron job.
+    The schedule is stored as bit masks, bit 'n' is set for minute 'n' (0-1439), weekday 'n' (0-6), season 'n' (0-3) or moon phase 'n' (0-7).
+    """
+    __slots__ = ('job_id', 'handle', 'callback_path', 'callback', 'args', 'minute_mask', 'weekday_mask', 'season_mask', 'moon_phase_mask', 'catch_up', 'threaded', )
+
+    def __init__(self, job_id: str, callback_path: str, args: Tuple, minute_mask: int, weekday_mask: int, season_mask: int, moon_phase_mask: int,
+                 catch_up: CrontabCatchUp = CrontabCatchUp.RUN_ONCE, callback: Union[Callable, None] = None, threaded: bool = False):
+        self.job_id = job_id
+        self.handle = -1  # Assigned by the ScheduleIndex
+        self.callback_path = callback_path
+        self.callback = callback  # Resolved on first use
+        self.args = args  # Immutable, parsed once
+        self.minute_mask = minute_mask
+        self.weekday_mask = weekday_mask
+        self.season_mask = season_mask
+        self.moon_phase_mask = moon_phase_mask
+        self.catch_up = catch_up
+        self.threaded = threaded  # Run in the JobPool, the callback must not access the game state
+
+    def get_callback(self) -> Callable:
+        """ :return: The callback, it is resolved on first use. An exception is raised if it can't be resolved. """
+        if self.callback is None:
+            self.callback = CallbackResolver.resolve(self.callback_path)
+        return self.callback
+
+    @staticmethod
+    def freeze_args(value: Any) -> Any:
+        """ :return: The value with lists and tuples as tuples, dicts as read-only mappings and sets as frozensets, also nested ones """
+        if isinstance(value, (list, tuple)):
+            return tuple(CronJob.freeze_args(v) for v in value)
+        if isinstance(value, (dict, MappingProxyType)):
+            return MappingProxyType({k: CronJob.freeze_args(v) for k, v in value.items()})
+        if isinstance(value, (set, frozenset)):
+            return frozenset(value)
+        return value
+
+    @staticmethod
+    def thaw_args(value: Any) -> Any:
+        """ :return: A copy of frozen arguments with plain dicts and sets, they can be pickled and written with repr() """
+        if isinstance(value, tuple):
+            return tuple(CronJob.thaw_args(v) for v in value)
+        if isinstance(value, MappingProxyType):
+            return {k: CronJob.thaw_args(v) for k, v in value.items()}
+        if isinstance(value, frozenset):
+            return set(value)
+        return value
+
+    def get_filter_masks(self) -> Tuple[int, int, int, int]:
+        """ :return: Weekday, season, moon phase and catch-up policy (bit 'policy' set) masks """
+        return self.weekday_mask, self.season_mask, self.moon_phase_mask, 1 << int(self.catch_up)
+
+    def __repr__(self) -> str:
+        return f"CronJob({self.job_id}#{self.handle}: {self.callback or self.callback_path}{self.args} " \
+               f"minutes={bin(self.minute_mask).count('1')} wd={self.weekday_mask:07b} s={self.season_mask:04b} mp={self.moon_phase_mask:08b} {self.catch_up.name}{' THREAD' if self.threaded else ''})"
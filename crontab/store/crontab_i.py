@@ -5,9 +5,14 @@
 
 
 import os
+import time
+from typing import Tuple, List, Dict
 
 from crontab.modinfo import ModInfo
+from crontab.store.crontab_snapshot import CrontabSnapshot
+from crontab.store.crontab_store import CrontabStore
 from crontab.store.manage_crontab import ManageCrontab
+from crontab.verbosity import Verbosity
 from sims4communitylib.utils.common_log_registry import CommonLog, CommonLogRegistry
 from ts4lib.libraries.ts4folders import TS4Folders
 
@@ -16,19 +21,156 @@ log.enable()
 
 
 class CrontabI:
+    """
+    Load 'crontab.txt' and the '*.txt' files in 'crontab.d/'. Every file is parsed, cached and reloaded on its own.
+    Mods should ship their jobs as 'crontab.d/{mod_name}.txt' instead of editing 'crontab.txt'.
+    """
+    auto_reload = True
+    """ auto_reload - Check the crontab files for changes every 'reload_interval_s' seconds and apply them """
+    reload_interval_s: float = 5
+    t_last_check: float = 0
+
     def __init__(self):
         self.ts4f = TS4Folders(ModInfo.get_identity().base_namespace)
+        self.file_name = os.path.join(self.ts4f.data_folder, 'crontab.txt')
+        self.directory = os.path.join(self.ts4f.data_folder, 'crontab.d')
+
+    def get_file_names(self) -> List[str]:
+        """ :return: 'crontab.txt' and the '*.txt' files in 'crontab.d/' in alphabetical order """
+        file_names = [self.file_name]
+        try:
+            file_names += sorted(os.path.join(self.directory, file_name) for file_name in os.listdir(self.directory) if file_name.endswith('.txt'))
+        except OSError:
+            pass  # No 'crontab.d/'
+        return file_names
 
     def load(self):
-        file_name = os.path.join(self.ts4f.data_folder, 'crontab.txt')
+        """ Load all crontab files, the schedule index is updated once for all files """
+        with ManageCrontab().transaction():
+            for file_name in self.get_file_names():
+                self._load_file(file_name)
+
+    def _load_file(self, file_name: str):
+        """ Load the jobs from the snapshot if the file is unchanged, otherwise parse the file and store a new snapshot. """
         try:
+            cs = CrontabStore()
             mc = ManageCrontab()
-            with open(file_name, 'rt', encoding='UTF-8') as fp:
+            with open(file_name, 'rb') as fp:
                 data = fp.read()
-                for line in data.split('\n'):
-                    line = line.strip()
-                    if not line or line.startswith('#'):
-                        continue
-                    mc.add_crontab_line(line, save_data=False)
+            snapshot = CrontabSnapshot(file_name)
+            signature = snapshot.get_signature(file_name, data)
+            cached = snapshot.load(signature)
+            if cached:
+                jobs, crontab_lines = cached
+                mc.add_parsed_jobs(jobs, crontab_lines, save_data=False)
+                if Verbosity.level >= Verbosity.SUMMARY:
+                    log.debug(f"Loaded {len(jobs)} jobs from '{snapshot.file_name}'")
+            else:
+                job_ids = mc.add_jobs(data.decode('UTF-8').split('\n'), save_data=False)
+                job_ids = [job_id for job_id in dict.fromkeys(job_ids) if job_id in cs.cron_jobs]
+                crontab_lines = {job_id: cs.crontab_lines.get(job_id) for job_id in job_ids}
+                snapshot.save(signature, [cs.cron_jobs.get(job_id) for job_id in job_ids], crontab_lines)
+            cs.file_lines.update({file_name: crontab_lines})
+            cs.file_signatures.update({file_name: signature})
+            cs.job_files.update({job_id: file_name for job_id in crontab_lines.keys()})
+        except Exception as e:
+            log.error(f"Couldn't import {file_name}")
+
+    @staticmethod
+    def check() -> bool:
+        """
+        Reload the crontab files if they have been changed. The files are checked at most every 'reload_interval_s' seconds.
+        :return: True if jobs have been changed
+        """
+        if not CrontabI.auto_reload:
+            return False
+        t_now = time.time()
+        if t_now - CrontabI.t_last_check < CrontabI.reload_interval_s:
+            return False
+        CrontabI.t_last_check = t_now
+        if not CrontabStore().is_initialized:
+            return False
+        return CrontabI().reload()[1] > 0
+
+    def reload(self, force: bool = False) -> Tuple[int, int]:
+        """
+        Apply the changes of all crontab files, unchanged files are skipped. The jobs of deleted files in 'crontab.d/' are removed.
+        :param force: Compare the lines even if size and mtime of a file did not change
+        :return: Number of reloaded files and number of changed jobs
+        """
+        files = 0
+        changes = 0
+        cs = CrontabStore()
+        with ManageCrontab().transaction():
+            for file_name in dict.fromkeys(self.get_file_names() + list(cs.file_lines.keys())):
+                _changes = self._reload_file(file_name, force)
+                if _changes is not None:
+                    files += 1
+                    changes += _changes
+        return files, changes
+
+    def _reload_file(self, file_name: str, force: bool):
+        """
+        Apply the changes of a file. Only new and modified lines are parsed, the jobs of removed lines are removed.
+        :return: Number of changed jobs or None if the file is unchanged
+        """
+        try:
+            cs = CrontabStore()
+            old_signature = cs.file_signatures.get(file_name)
+            snapshot = CrontabSnapshot(file_name)
+            if os.path.isfile(file_name):
+                stat = os.stat(file_name)
+                if not force and old_signature and old_signature[:2] == (stat.st_size, stat.st_mtime_ns):
+                    return None
+                with open(file_name, 'rb') as fp:
+                    data = fp.read()
+                signature = snapshot.get_signature(file_name, data)
+                cs.file_signatures.update({file_name: signature})
+                if not force and old_signature and old_signature[2] == signature[2]:
+                    return None  # Touched but not modified
+                lines = data.decode('UTF-8').split('\n')
+            elif file_name in cs.file_lines:
+                signature = None  # Deleted
+                lines = []
+            else:
+                return None
+
+            # Jobs with the same job_id in a later file belong to that file, they are not removed with this file
+            old_crontab_lines: Dict[str, str] = {job_id: crontab_line for job_id, crontab_line in cs.file_lines.get(file_name, dict()).items()
+                                                 if cs.job_files.get(job_id) == file_name}
+            # Their unchanged lines are not parsed again, they would replace the jobs of the later file
+            overridden_lines: Dict[str, str] = {job_id: crontab_line for job_id, crontab_line in cs.file_lines.get(file_name, dict()).items()
+                                                if job_id not in old_crontab_lines}
+            skipped_lines: Dict[str, str] = dict()
+            overridden_job_ids: Dict[str, List[str]] = dict()  # {'crontab_line': ['job_id', ...], ...}
+            for job_id, crontab_line in overridden_lines.items():
+                overridden_job_ids.setdefault(crontab_line, []).append(job_id)
+            _lines = []
+            for line in lines:
+                job_ids = overridden_job_ids.get(line.strip())
+                if job_ids:
+                    job_id = job_ids.pop()
+                    skipped_lines.update({job_id: overridden_lines.get(job_id)})
+                else:
+                    _lines.append(line)
+            crontab_lines = ManageCrontab().apply_crontab_lines(_lines, old_crontab_lines, save_data=False)
+            for job_id in old_crontab_lines.keys() - crontab_lines.keys():
+                cs.job_files.pop(job_id, None)
+            cs.job_files.update({job_id: file_name for job_id in crontab_lines.keys()})
+            if signature:
+                cs.file_lines.update({file_name: {**crontab_lines, **skipped_lines}})
+                if skipped_lines:
+                    snapshot.delete()  # The skipped lines are not parsed, the next start parses the file again to keep the order of the files
+                else:
+                    snapshot.save(signature, [cs.cron_jobs.get(job_id) for job_id in crontab_lines.keys()], crontab_lines)
+            else:
+                cs.file_lines.pop(file_name, None)
+                cs.file_signatures.pop(file_name, None)
+                snapshot.delete()
+            changes = sum(1 for job_id in crontab_lines.keys() | old_crontab_lines.keys() if crontab_lines.get(job_id) != old_crontab_lines.get(job_id))
+            if Verbosity.level >= Verbosity.SUMMARY:
+                log.debug(f"Reloaded {file_name}: {len(crontab_lines)} jobs, {changes} changes")
+            return changes
         except Exception as e:
-            log.error(f"Couldn't import {file_name}")
\ No newline at end of file
+            log.error(f"Couldn't reload {file_name} ({e})", throw=False)
+            return None
@@ -5,8 +5,12 @@
 
 
 import os
+import threading
+import time
+from typing import Dict, List, Set, Tuple, Union
 
 from crontab.modinfo import ModInfo
+from crontab.store.crontab_snapshot import CrontabSnapshot
 from crontab.store.crontab_store import CrontabStore
 from ts4lib.libraries.ts4folders import TS4Folders
 
@@ -17,15 +21,141 @@ log.enable()
 
 
 class CrontabO:
+    """
+    Save the crontab files. Changes are collected with request_save() and written once after a quiet period of 'write_delay_s' seconds
+    or when the game is saved or the zone is left. Files are written to a temporary file which replaces the old file.
+    """
+    write_delay_s: float = 2
+    """ write_delay_s - Save the changes when there were no further changes for this time """
+    use_thread = False
+    """ use_thread - Write the files in a background thread """
+    t_dirty: float = 0  # Time of the last unsaved change, 0 if there are none
+    _thread: Union[threading.Thread, None] = None
+
     def __init__(self):
         self.ts4f = TS4Folders(ModInfo.get_identity().base_namespace)
 
-    def save(self):
-        file_name = os.path.join(self.ts4f.data_folder, 'crontab.txt')
+    @staticmethod
+    def request_save():
+        """ Mark the crontab as changed, flush() saves it after the quiet period """
+        CrontabO.t_dirty = time.time()
+
+    @staticmethod
+    def flush(force: bool = False) -> bool:
+        """
+        Save the changes if the quiet period is over.
+        :param force: Save the changes now and wait until they are written, use it when the game is saved or the zone is left
+        :return: True if the crontab has been saved
+        """
+        if not CrontabO.t_dirty:
+            if force:
+                CrontabO._join()
+            return False
+        if not force and time.time() - CrontabO.t_dirty < CrontabO.write_delay_s:
+            return False
+        CrontabO().save(wait=force)
+        return True
+
+    def save(self, wait: bool = True):
+        """
+        Save every job to the file it has been loaded from, new jobs are saved to 'crontab.txt'.
+        Only files which own a changed job are written. Comments, empty lines and jobs which are overridden by a later file are kept as they are.
+        :param wait: Write the files in this thread even if 'use_thread' is set
+        """
+        CrontabO.t_dirty = 0
+        CrontabO._join()  # The files are read again to keep the lines of other jobs
+        cs = CrontabStore()
+        main_file_name = os.path.join(self.ts4f.data_folder, 'crontab.txt')
+        files: Dict[str, Dict[str, str]] = {file_name: dict() for file_name in cs.file_lines.keys()}  # {'file_name': {'job_id': 'crontab', ...}, ...}
+        files.setdefault(main_file_name, dict())
+        for job_id, crontab in cs.crontab_lines.items():
+            files.get(cs.job_files.get(job_id, main_file_name)).update({job_id: crontab})
+
+        writes: List[Tuple[str, bytes]] = []
+        for file_name, crontab_lines in files.items():
+            file_lines = cs.file_lines.get(file_name, dict())
+            old_crontab_lines = {job_id: crontab for job_id, crontab in file_lines.items() if cs.job_files.get(job_id, main_file_name) == file_name}
+            changed_job_ids = {job_id for job_id in crontab_lines.keys() | old_crontab_lines.keys()
+                               if self._format(job_id, crontab_lines.get(job_id, '')) != self._format(job_id, old_crontab_lines.get(job_id, ''))}
+            if not changed_job_ids and os.path.isfile(file_name):
+                continue
+            data, file_lines = self._merge(file_name, file_lines, crontab_lines, changed_job_ids)
+            writes.append((file_name, data))
+            # Don't reload the own changes
+            for job_id in old_crontab_lines.keys() - crontab_lines.keys():
+                cs.job_files.pop(job_id, None)
+            cs.file_lines.update({file_name: file_lines})
+            cs.job_files.update({job_id: file_name for job_id in crontab_lines.keys()})
+        if not writes:
+            return
+
+        if CrontabO.use_thread and not wait:
+            CrontabO._thread = threading.Thread(target=self._save_files, args=(writes, ), daemon=True)
+            CrontabO._thread.start()
+        else:
+            self._save_files(writes)
+
+    @staticmethod
+    def _join():
+        """ Wait for the files of the previous save() """
+        thread = CrontabO._thread
+        if thread:
+            thread.join()
+            CrontabO._thread = None
+
+    def _merge(self, file_name: str, file_lines: Dict[str, str], crontab_lines: Dict[str, str], changed_job_ids: Set[str]) -> Tuple[bytes, Dict[str, str]]:
+        """
+        Replace the lines of the changed jobs in the file, remove the lines of removed jobs and append new jobs. All other lines are kept word for word.
+        :param file_lines: {'job_id': 'crontab', ...} of the lines in the file when it has been loaded or saved
+        :param crontab_lines: {'job_id': 'crontab', ...} of the jobs owned by the file
+        :param changed_job_ids: The jobs owned by the file which have been added, modified or removed
+        :return: The new content and {'job_id': 'crontab', ...} of the lines in the new content
+        """
+        job_ids: Dict[str, List[str]] = dict()  # {'crontab': ['job_id', ...], ...}
+        for job_id, crontab in file_lines.items():
+            job_ids.setdefault(crontab, []).append(job_id)
         try:
-            cs = CrontabStore()
-            with open(os.path.join(self.ts4f.data_folder, 'crontab.txt'), 'wt', encoding='UTF-8') as fp:
-                for job_id, crontab in cs.crontab_lines.items():
-                    fp.write(f"{crontab}  # {job_id}\r\n")
-        except Exception as e:
-            log.error(f"Couldn't write {file_name}")
\ No newline at end of file
+            with open(file_name, 'rb') as fp:
+                lines = fp.read().decode('UTF-8').splitlines(keepends=True)
+        except OSError:
+            lines = []
+
+        new_lines: List[str] = []
+        new_file_lines: Dict[str, str] = dict()
+        for line in lines:
+            _job_ids = job_ids.get(line.strip())
+            job_id = _job_ids.pop(0) if _job_ids else None
+            if job_id is None or job_id not in changed_job_ids:
+                new_lines.append(line)
+                if job_id is not None:
+                    new_file_lines.update({job_id: line.strip()})
+            elif job_id in crontab_lines:
+                new_lines.append(f"{self._format(job_id, crontab_lines.get(job_id))}\r\n")
+                new_file_lines.update({job_id: new_lines[-1].strip()})
+        if new_lines and not new_lines[-1].endswith('\n'):
+            new_lines[-1] += '\r\n'
+        for job_id in changed_job_ids - new_file_lines.keys():
+            if job_id in crontab_lines:
+                new_lines.append(f"{self._format(job_id, crontab_lines.get(job_id))}\r\n")
+                new_file_lines.update({job_id: new_lines[-1].strip()})
+        return ''.join(new_lines).encode('UTF-8'), new_file_lines
+
+    @staticmethod
+    def _format(job_id: str, crontab: str) -> str:
+        """ :return: The line as it is read back, the job_id comment is not added twice """
+        return f"{crontab.split(' # ', 1)[0].strip()}  # {job_id}"
+
+    @staticmethod
+    def _save_files(writes: List[Tuple[str, bytes]]):
+        cs = CrontabStore()
+        for file_name, data in writes:
+            tmp_file_name = f"{file_name}.tmp"
+            try:
+                with open(tmp_file_name, 'wb') as fp:
+                    fp.write(data)
+                    fp.flush()
+                    os.fsync(fp.fileno())
+                os.replace(tmp_file_name, file_name)  # Atomic, the old file stays intact if writing failed
+                cs.file_signatures.update({file_name: CrontabSnapshot.get_signature(file_name, data)})
+            except Exception as e:
+                log.error(f"Couldn't write {file_name} ({e})", throw=False)
@@ -0,0 +1,86 @@
+#
+# LICENSE https://creativecommons.org/licenses/by/4.0/ https://creativecommons.org/licenses/by/4.0/legalcode
+# © 2023 https://github.com/Oops19
+#
+
+
+import hashlib
+import os
+import pickle
+from typing import List, Dict, Tuple, Union
+
+from crontab.enums.catch_up import CrontabCatchUp
+from crontab.modinfo import ModInfo
+from crontab.store.cron_job import CronJob
+from crontab.verbosity import Verbosity
+from sims4communitylib.utils.common_log_registry import CommonLog, CommonLogRegistry
+
+log: CommonLog = CommonLogRegistry.get().register_log(ModInfo.get_identity(), ModInfo.get_identity().name)
+log.enable()
+
+
+class CrontabSnapshot:
+    """
+    Parsed jobs of a crontab file, stored next to it as 'crontab.cache'.
+    The snapshot is used only if size, mtime and hash of the crontab file and the mod version match, otherwise the file is parsed again.
+    """
+    SNAPSHOT_VERSION = 3  # Increment after changing the format or the meaning of the stored masks
+
+    def __init__(self, file_name: str):
+        """ :param file_name: The crontab file, e.g. '.../crontab.txt' """
+        self.file_name = f"{os.path.splitext(file_name)[0]}.cache"
+
+    @staticmethod
+    def get_signature(file_name: str, data: bytes) -> Tuple:
+        """
+        :param file_name: The crontab file
+        :param data: The content of the crontab file
+        :return: (size, mtime, hash) of the crontab file
+        """
+        stat = os.stat(file_name)
+        return stat.st_size, stat.st_mtime_ns, hashlib.sha1(data).hexdigest()
+
+    def _get_key(self, signature: Tuple) -> Tuple:
+        return CrontabSnapshot.SNAPSHOT_VERSION, f"{ModInfo.get_identity().version}", signature
+
+    def load(self, signature: Tuple) -> Union[Tuple[List[CronJob], Dict[str, str]], None]:
+        """
+        :param signature: The signature of the crontab file, see get_signature()
+        :return: (jobs, crontab_lines) or None if there is no valid snapshot
+        """
+        try:
+            with open(self.file_name, 'rb') as fp:
+                key, jobs, crontab_lines = pickle.load(fp)
+            if key != self._get_key(signature):
+                if Verbosity.level >= Verbosity.SUMMARY:
+                    log.debug(f"Snapshot '{self.file_name}' is outdated")
+                return None
+            return [CronJob(job[0], job[1], CronJob.freeze_args(job[2]), *job[3:7], CrontabCatchUp(job[7]), threaded=job[8]) for job in jobs], crontab_lines
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            log.error(f"Couldn't read snapshot '{self.file_name}' ({e})", throw=False)
+            return None
+
+    def save(self, signature: Tuple, jobs: List[CronJob], crontab_lines: Dict[str, str]):
+        """
+        Store the jobs as plain tuples, the callbacks are not stored and resolved again when the jobs run.
+        :param signature: The signature of the crontab file, see get_signature()
+        :param jobs: The jobs parsed from the crontab file
+        :param crontab_lines: The crontab lines of these jobs
+        """
+        _jobs = [(job.job_id, job.callback_path, CronJob.thaw_args(job.args), job.minute_mask, job.weekday_mask, job.season_mask, job.moon_phase_mask, int(job.catch_up),
+                  job.threaded)
+                 for job in jobs]
+        try:
+            with open(self.file_name, 'wb') as fp:
+                pickle.dump((self._get_key(signature), _jobs, crontab_lines), fp, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            log.error(f"Couldn't write snapshot '{self.file_name}' ({e})", throw=False)
+
+    def delete(self):
+        """ Delete the snapshot of a deleted crontab file """
+        try:
+            os.remove(self.file_name)
+        except OSError:
+            pass
@@ -4,10 +4,12 @@
 #
 
 
-from typing import Set, List
+from typing import List, Callable, Tuple
 from typing import Dict
 
 from crontab.modinfo import ModInfo
+from crontab.store.cron_job import CronJob
+from crontab.store.schedule_index import ScheduleIndex
 from ts4lib.utils.singleton import Singleton
 
 from sims4communitylib.utils.common_log_registry import CommonLog, CommonLogRegistry
@@ -21,11 +23,44 @@ class CrontabStore(object, metaclass=Singleton):
     def __init__(self):
         self.is_initialized = False
 
-        self.cron_jobs: Dict[str, List] = dict()  # {'job_id': [callback, arguments, weekdays, seasons, moon_phases], ...}
-        """ cron_jobs stores a list with all registered cron jobs """
+        self.cron_jobs: Dict[str, CronJob] = dict()  # {'job_id': CronJob, ...}
+        """ cron_jobs stores all registered cron jobs """
 
-        self.cron_job_schedules: Dict[int, Set[str]] = dict()  # {0..1439: ['job_id', 'job_id_2'], ...}
-        """ cron_job_schedules stores a list of 1440 schedules and the assigned cron jobs (weekday, season and moon phase are ignored """
+        self.schedule_index: ScheduleIndex = ScheduleIndex()
+        """ schedule_index stores the job handles for all 1440 minutes, weekdays, seasons and moon phases as bit masks """
 
         self.crontab_lines: Dict = dict()  # {'job_id': 'crontab', ...}
         """ crontab_lines stores a list with all crontab lines """
+
+        self.file_lines: Dict[str, Dict[str, str]] = dict()  # {'file_name': {'job_id': 'crontab', ...}, ...}
+        """ file_lines stores the crontab lines of every loaded file, it is used to apply only the changed lines on reload """
+
+        self.job_files: Dict[str, str] = dict()  # {'job_id': 'file_name', ...}
+        """ job_files stores the crontab file of every job loaded from a file, changes of the job are saved to this file """
+
+        self.file_signatures: Dict[str, Tuple] = dict()  # {'file_name': (size, mtime, hash), ...}
+        """ file_signatures stores the signature of every loaded file to detect changes """
+
+        self.next_handle: int = 1
+        """ next_handle is the handle of the next job added with ManageCrontab.register(), the job_id is '@{handle}' """
+
+        self.schedule_listeners: List[Callable[[], None]] = list()
+        """ schedule_listeners are called after jobs have been added or removed """
+
+        self.schedule_version: int = 0
+        """ schedule_version is incremented after jobs have been added or removed, use it to invalidate cached data """
+
+        self.transaction_depth: int = 0
+        self.pending_jobs: Dict[str, CronJob] = dict()  # {'job_id': CronJob, ...}
+        """ pending_jobs stores the jobs added within a transaction, they are added to the schedule_index on commit """
+        self.pending_save: bool = False
+        self.pending_notify: bool = False
+        """ pending_notify is set if jobs have been added, replaced or removed within a transaction """
+
+    def notify_schedule_changed(self):
+        self.schedule_version += 1
+        for listener in self.schedule_listeners:
+            try:
+                listener()
+            except Exception as e:
+                log.error(f"Error '{e}' in schedule listener '{listener}'", throw=False)
@@ -4,18 +4,25 @@
 #
 
 
+import ast
 import re
-from typing import Set
+import zlib
 
+from crontab.store.callback_resolver import CallbackResolver
+from crontab.store.cron_job import CronJob
 from crontab.store.crontab_o import CrontabO
 from crontab.store.crontab_store import CrontabStore
-import importlib
+from crontab.store.schedule import Schedule
+from crontab.store.schedule_index import ScheduleIndex
 import time
-from typing import List, Union
+from contextlib import contextmanager
+from typing import Callable, List, Union, Iterable, Dict, Tuple
 
+from crontab.enums.catch_up import CrontabCatchUp
 from crontab.enums.category import CrontabCategory
 from crontab.enums.constants import CrontabConstant
 from crontab.modinfo import ModInfo
+from crontab.verbosity import Verbosity
 from sims4communitylib.utils.common_log_registry import CommonLog, CommonLogRegistry
 
 log: CommonLog = CommonLogRegistry.get().register_log(ModInfo.get_identity(), ModInfo.get_identity().name)
@@ -23,6 +30,9 @@ log.enable()
 
 
 class ManageCrontab:
+    validate_callbacks = False
+    """ validate_callbacks - Resolve the callbacks when adding jobs and reject invalid ones. By default they are resolved when the job runs the first time. """
+    job_count: int = 0  # Makes the generated job_ids unique, many jobs are added within the same millisecond
 
     def __init__(self):
         self.cs = CrontabStore()
@@ -38,7 +48,10 @@ class ManageCrontab:
             return match.group(1)[1].upper()
 
         crontab_line_2 = re.sub(r1, "", crontab_line)
-        crontab_line_2 = re.sub(r2, " ", crontab_line_2)
+        # Typed arguments are kept as they are, they may contain strings with several spaces. Only the job_id comment is normalised.
+        head, sep, tail = crontab_line_2.partition(' (')
+        arguments, sep_2, comment = tail.partition('#')
+        crontab_line_2 = re.sub(r2, " ", head) + sep + arguments + sep_2 + re.sub(r2, " ", comment)
         if '#' in crontab_line_2:
             matches = re.match(r4, crontab_line_2)
         else:
@@ -46,77 +59,277 @@ class ManageCrontab:
         if matches and matches.groups():
             times = matches.group(1).upper()
             command, arg_str = f"{matches.group(2)} ".split(' ', 1)
+            options: Dict[str, str] = dict()  # '@key=value' tokens in front of the command
+            while command.startswith('@'):
+                key, _, value = command[1:].partition('=')
+                options.update({key.lower(): value.upper()})
+                command, arg_str = f"{arg_str.strip()} ".split(' ', 1)
             if command == 'nop':
                 command = 'crontab.ui.crontab_ui.CrontabUI.nop'
             else:
                 command = re.sub(r'(\^[a-z])', _upper, command)
-            if arg_str:
-                _args = arg_str.strip().split(' ')
-            else:
-                _args = []
+            arg_str = arg_str.strip()
+            _args = None
+            if arg_str.startswith('(') and arg_str.endswith(')'):
+                try:
+                    _args = self._parse_args(arg_str)
+                except Exception as e:
+                    # No Python literal, e.g. '(hello)', pass the words as strings like before
+                    if Verbosity.level >= Verbosity.PARSER:
+                        log.debug(f"Arguments '{arg_str}' of '{crontab_line}' are no literal ({e})")
+            if _args is None:
+                _args = tuple(arg_str.split(' ')) if arg_str else ()
             if len(matches.groups()) == 3:
                 job_id = matches.group(3)
             else:
                 job_id = None
 
-            job_id = self.add_job(times, command, _args, job_id=job_id, save_data=save_data)
-            log.debug(f"Added job as '{job_id}'")
-            self.cs.crontab_lines.update({job_id: crontab_line})
+            catch_up = CrontabCatchUp(CrontabConstant.CATCH_UP_MAP.get(options.get('catch_up'), CrontabCatchUp.RUN_ONCE))
+            threaded = 'thread' in options and options.get('thread') not in ('0', 'FALSE', 'NO', )  # '@thread' or '@thread=true'
+            spread = self._get_int(options.get('spread', '0'), None)
+            # No transaction needed, the crontab is saved after the quiet period and the line is stored before
+            job_id = self.add_job(times, command, _args, job_id=job_id, save_data=save_data, catch_up=catch_up, threaded=threaded, spread=spread)
+            if job_id:
+                if Verbosity.level >= Verbosity.JOBS:
+                    log.debug(f"Added job as '{job_id}'")
+                self.cs.crontab_lines.update({job_id: crontab_line})
             return job_id
         else:
-            log.debug(f"Could not process '{crontab_line}'")
+            if Verbosity.level >= Verbosity.SUMMARY:
+                log.debug(f"Could not process '{crontab_line}'")
 
-    def add_job(self, crontab_times, callback: str, args: Union[List, None] = None, job_id: str = None, save_data: bool = True) -> str:
+    def add_job(self, crontab_times, callback: str, args: Union[List, None] = None, job_id: str = None, save_data: bool = True,
+                catch_up: CrontabCatchUp = CrontabCatchUp.RUN_ONCE, threaded: bool = False, spread: int = 0) -> str:
         """
         Add a job to crontab.
-        :param crontab_times: The string to define the times (minutes hours weekdays seasons moon_phases)
+        :param crontab_times: The string to define the times (minutes hours weekdays seasons moon_phases).
+            '~' in front of the minutes spreads the runs of the job over the time until its next run (max. 60 minutes), see 'spread'.
         :param callback: callback method. '^x' is converted to 'X' to be able to use cheat commands which are all lower case.
-        :param args: List with arguments, [] or None for no arguments
+        :param args: List or tuple with arguments, [] or None for no arguments. They are stored as a tuple.
         :param job_id: Unique name/ID of the job, generated if not specified
         :param save_data: Set to 'False' to persist the entry on disk and reload later (not yet supported)
+        :param catch_up: What to do with runs missed during a time jump
+        :param threaded: Run the job in a worker thread. Only for callbacks which do not access the game state (file I/O, computation, ...).
+            A callable returned by the callback is called on the main thread with a later tick.
+        :param spread: Move all runs of the job by 0 to 'spread' - 1 minutes, the offset is calculated from the job_id
         :return: Returns the job_id or None if the job could not be added.
         """
-        log.debug(f"add_job({crontab_times}, {callback}, {args}, {job_id}, {save_data})")
+        if Verbosity.level >= Verbosity.JOBS:
+            log.debug(f"add_job({crontab_times}, {callback}, {args}, {job_id}, {save_data}, {catch_up}, {threaded}, {spread})")
         if not job_id:
-            job_id = f"t{int(time.time() * 1000)}"
-        if not args:
-            args = []
-
-        try:
-            _class_string, _function_name = callback.rsplit('.', 1)
-            _module_name, _class_name = _class_string.rsplit('.', 1)
-            _class = getattr(importlib.import_module(_module_name), _class_name)
-            _function = getattr(_class, _function_name)
-        except Exception as e:
-            log.error(f"Error '{e} - Could not add '{callback}'", throw=False)
-            #  'module 'crontab.ui' has no attribute 'CrontabUI' - Could not add 'crontab.ui.CrontabUI.nop'
+            ManageCrontab.job_count += 1
+            job_id = f"t{int(time.time() * 1000)}_{ManageCrontab.job_count}"
+        job = self._create_job(crontab_times, callback, args, job_id, catch_up, threaded, spread)
+        if not job:
             return ''
 
-        mm, hh, wd, ss, mp = crontab_times.split(' ', 5)
+        self._add_job(job)
+        self._schedule_changed(save_data)
+
+        if Verbosity.level >= Verbosity.JOBS:
+            log.debug(f"add_job() -> {job_id}")
+        return job_id
+
+    def replace_job(self, job_id: str, crontab_times, callback: str, args: Union[List, None] = None, save_data: bool = True,
+                    catch_up: CrontabCatchUp = CrontabCatchUp.RUN_ONCE, threaded: bool = False, spread: int = 0) -> bool:
+        """
+        Replace schedule, callback and arguments of an existing job in one step.
+        Only the minutes, weekdays, seasons and moon phases which differ between the old and the new schedule are updated.
+        :param job_id: The job_id to replace
+        :param crontab_times: The string to define the times (minutes hours weekdays seasons moon_phases)
+        :param callback: callback method
+        :param args: List with arguments, [] or None for no arguments
+        :param save_data: Set to 'False' to avoid saving the crontab
+        :param catch_up: What to do with runs missed during a time jump
+        :param threaded: Run the job in a worker thread
+        :param spread: Move all runs of the job by 0 to 'spread' - 1 minutes
+        :return: True for success, otherwise false
+        """
+        old_job = self.cs.cron_jobs.get(job_id)
+        if not old_job:
+            return False
+        job = self._create_job(crontab_times, callback, args, job_id, catch_up, threaded, spread)
+        if not job:
+            return False
+        self._replace_job(old_job, job)
+        if job_id in self.cs.crontab_lines:
+            catch_up_names = {v: k for k, v in CrontabConstant.CATCH_UP_MAP.items()}
+            options = [] if catch_up == CrontabCatchUp.RUN_ONCE else [f"@catch_up={catch_up_names.get(int(catch_up)).lower()}"]
+            if threaded:
+                options.append('@thread')
+            if spread > 1:
+                options.append(f"@spread={spread}")
+            self.cs.crontab_lines.update({job_id: ' '.join([crontab_times] + options + [callback] + self._format_args(job.args))})
+        self._schedule_changed(save_data)
+        return True
+
+    def _create_job(self, crontab_times, callback: str, args: Union[List, None], job_id: str, catch_up: CrontabCatchUp,
+                    threaded: bool = False, spread: int = 0) -> Union[CronJob, None]:
+        args = CronJob.freeze_args(tuple(args)) if args else ()
+
+        _function = None
+        if ManageCrontab.validate_callbacks:
+            try:
+                _function = CallbackResolver.resolve(callback)
+            except Exception as e:
+                log.error(f"Couldn't add '{job_id}', '{callback}' can't be resolved ({e})", throw=False)
+                return None
+
+        if crontab_times.startswith('~'):
+            schedule = self.parse_schedule(crontab_times[1:])
+            spread = self._get_min_gap(schedule.minute_mask)
+        else:
+            schedule = self.parse_schedule(crontab_times)
+        if spread > 1:
+            schedule = self._spread(schedule, job_id, spread)
+        job = CronJob(job_id, callback, args, schedule.minute_mask, schedule.weekday_mask, schedule.season_mask, schedule.moon_phase_mask,
+                      catch_up, _function, threaded)
+        if Verbosity.level >= Verbosity.PARSER:
+            log.debug(f"{crontab_times} -> '{job}'")
+        return job
+
+    def parse_schedule(self, crontab_times: str) -> Schedule:
+        """
+        Parse the times of a crontab line once, e.g. to register many jobs with the same schedule.
+        :param crontab_times: The string to define the times (minutes hours weekdays seasons moon_phases)
+        :return: The parsed schedule
+        """
+        mm, hh, wd, ss, mp = crontab_times.upper().split(' ', 5)
         minutes: List = self._parse_time(mm, CrontabCategory.MINUTE)
         hours: List = self._parse_time(hh, CrontabCategory.HOUR)
         weekdays: List = self._parse_time(wd, CrontabCategory.WEEKDAY)
         seasons: List = self._parse_time(ss, CrontabCategory.SEASON)
         moon_phases: List = self._parse_time(mp, CrontabCategory.MOON_PHASE)
-        self.cs.cron_jobs.update({job_id: [_function, args, weekdays, seasons, moon_phases]})  # () vs [] TODO ????
-
-        cron_job_schedules = self.cs.cron_job_schedules
-        for hour in hours:
-            for minute in minutes:
-                _et = hour * 60 + minute
-                jobs: Set = cron_job_schedules.get(_et, set())
-                jobs.add(job_id)
-                log.debug(f"@({_et}) -> '{jobs}'")
-                cron_job_schedules.update({_et: jobs})
-
-        # Sort dict
-        self.cs.cron_job_schedules = {key: cron_job_schedules[key] for key in sorted(cron_job_schedules.keys())}  # = dict(sorted(cron_job_schedules.items()))
-        if save_data:
-            co = CrontabO()
-            co.save()
-
-        log.debug(f"add_job() -> {job_id}")
-        return job_id
+        minute_mask = ScheduleIndex.to_mask([hour * 60 + minute for hour in hours for minute in minutes])
+        if Verbosity.level >= Verbosity.PARSER:
+            log.debug(f"@({hours} x {minutes})")
+        return Schedule.from_masks(minute_mask, ScheduleIndex.to_mask(weekdays), ScheduleIndex.to_mask(seasons), ScheduleIndex.to_mask(moon_phases))
+
+    def register(self, callback: Callable, schedule: Schedule, args: Tuple = (), catch_up: CrontabCatchUp = CrontabCatchUp.RUN_ONCE,
+                 threaded: bool = False, spread: int = 0) -> int:
+        """
+        Add a job for a callable (function, bound method, functools.partial, ...) without parsing, importing or saving anything.
+        The job lives until unregister() is called or the game is closed, it is not written to the crontab file.
+        :param callback: The callable, it is called with '*args'
+        :param schedule: A Schedule object, create it once with Schedule(...) or parse_schedule() and use it for all jobs with the same times
+        :param args: Arguments of the callable
+        :param catch_up: What to do with runs missed during a time jump
+        :param threaded: Run the job in a worker thread
+        :param spread: Move all runs of the job by 0 to 'spread' - 1 minutes
+        :return: The handle to unregister the job, handles are not reused
+        """
+        handle = self.cs.next_handle
+        self.cs.next_handle += 1
+        if spread > 1:
+            schedule = self._spread(schedule, f"@{handle}", spread)
+        job = CronJob(f"@{handle}", '', args, schedule.minute_mask, schedule.weekday_mask, schedule.season_mask, schedule.moon_phase_mask,
+                      catch_up, callback, threaded)
+        self._add_job(job)
+        self._schedule_changed(False)
+        return handle
+
+    def unregister(self, handle: int) -> bool:
+        """
+        Remove a job added with register().
+        :param handle: The handle returned by register()
+        :return: True for success, False if there is no job with this handle
+        """
+        return self.remove_job(f"@{handle}", save_data=False)
+
+    @staticmethod
+    def _spread(schedule: Schedule, job_id: str, spread: int) -> Schedule:
+        """
+        Move all minutes of the schedule by the same offset (0 to 'spread' - 1), jobs with the same times but different job_ids run at different minutes.
+        The offset is the CRC32 of the job_id, it is the same after every start of the game.
+        It is limited to the minutes left after the last run of the day, the runs stay on the day matching the weekday, season and moon phase.
+        """
+        minutes_left = CrontabConstant.MINUTES_PER_DAY - schedule.minute_mask.bit_length()  # After the last run, 0-1439
+        offset = zlib.crc32(job_id.encode('UTF-8')) % max(1, min(spread, minutes_left + 1))
+        if not offset:
+            return schedule
+        return Schedule.from_masks(schedule.minute_mask << offset, schedule.weekday_mask, schedule.season_mask, schedule.moon_phase_mask)
+
+    @staticmethod
+    def _get_min_gap(minute_mask: int) -> int:
+        """ :return: Minutes between the two closest runs (also across midnight), max. 60 """
+        minutes = list(ScheduleIndex.iter_bits(minute_mask))
+        if not minutes:
+            return 0
+        gaps = [b - a for a, b in zip(minutes, minutes[1:])] + [minutes[0] + CrontabConstant.MINUTES_PER_DAY - minutes[-1]]
+        return min(min(gaps), 60)
+
+    @staticmethod
+    def _parse_args(arg_str: str) -> Tuple:
+        """
+        Parse typed arguments once, e.g. '(5, 1.5, True, "two words", [1, 2])'.
+        Lists are converted to tuples, dicts to read-only mappings and sets to frozensets, the arguments are shared by all runs.
+        :param arg_str: A Python literal in parentheses
+        :return: The arguments, an exception is raised for invalid literals
+        """
+        args = ast.literal_eval(arg_str)
+        if not isinstance(args, tuple):
+            args = (args, )  # '(5)'
+        return CronJob.freeze_args(args)
+
+    @staticmethod
+    def _format_args(args: Tuple) -> List[str]:
+        """ :return: The arguments as written in a crontab line, typed if there is any argument which is no plain word """
+        if all(isinstance(arg, str) and arg and ' ' not in arg and not arg.startswith('(') for arg in args):
+            return list(args)
+        return [repr(CronJob.thaw_args(tuple(args)))]
+
+    def validate_jobs(self) -> Dict[str, str]:
+        """
+        Resolve the callbacks of all jobs now.
+        :return: {'job_id': 'error', ...} for all jobs with callbacks which can't be resolved
+        """
+        errors: Dict[str, str] = dict()
+        for job_id, job in self.cs.cron_jobs.items():
+            try:
+                job.get_callback()
+            except Exception as e:
+                errors.update({job_id: f"{job.callback_path}: {e}"})
+        return errors
+
+    def add_parsed_jobs(self, jobs: Iterable[CronJob], crontab_lines: Dict[str, str], save_data: bool = True):
+        """
+        Add jobs which have been parsed before, e.g. restored from a snapshot. The schedule index is updated and the crontab is saved only once.
+        :param jobs: The jobs to add
+        :param crontab_lines: {'job_id': 'crontab_line', ...} of these jobs
+        :param save_data: Set to 'False' to avoid saving the crontab
+        """
+        with self.transaction():
+            for job in jobs:
+                self._add_job(job)
+            self.cs.crontab_lines.update(crontab_lines)
+            self._schedule_changed(save_data)
+
+    def _add_job(self, job: CronJob):
+        old_job = self.cs.cron_jobs.get(job.job_id)
+        if old_job:
+            self._replace_job(old_job, job)
+        else:
+            self.cs.cron_jobs.update({job.job_id: job})
+            if self.cs.transaction_depth:
+                self.cs.pending_jobs.update({job.job_id: job})
+            else:
+                self.cs.schedule_index.add(job)
+
+    def _replace_job(self, old_job: CronJob, job: CronJob):
+        self.cs.cron_jobs.update({job.job_id: job})
+        if self.cs.pending_jobs.pop(job.job_id, None) is None:
+            self.cs.schedule_index.replace(old_job, job)
+        else:
+            self.cs.pending_jobs.update({job.job_id: job})
+
+    def _schedule_changed(self, save_data: bool):
+        if self.cs.transaction_depth:
+            self.cs.pending_save |= save_data
+            self.cs.pending_notify = True
+        else:
+            if save_data:
+                CrontabO.request_save()
+            self.cs.notify_schedule_changed()
 
     def remove_job(self, job_id: str, save_data: bool = True) -> bool:
         """
@@ -125,24 +338,103 @@ class ManageCrontab:
         :return: True for success, otherwise false
         """
         try:
-            del self.cs.cron_jobs[job_id]
-            del self.cs.crontab_lines[job_id]
-            to_delete = set()
-            for _time, job_ids in self.cs.cron_job_schedules.items():
-                if job_id in job_ids:
-                    job_ids.remove(job_id)
-                    self.cs.cron_job_schedules.update({_time: job_ids})
-                    if not job_ids:
-                        to_delete.add(_time)
-            for _time in to_delete:
-                del self.cs.cron_job_schedules[_time]
-            if save_data:
-                co = CrontabO()
-                co.save()
+            job = self.cs.cron_jobs.pop(job_id)
+            self.cs.crontab_lines.pop(job_id, None)
+            if self.cs.pending_jobs.pop(job_id, None) is None:
+                self.cs.schedule_index.remove(job)
+            self._schedule_changed(save_data)
             return True
         except:
             return False
 
+    def add_jobs(self, crontab_lines: Iterable[str], save_data: bool = True) -> List[str]:
+        """
+        Add many jobs to crontab. The schedule index is updated and the crontab is saved only once.
+        :param crontab_lines: Crontab lines, empty lines and comments are skipped
+        :param save_data: Set to 'False' to avoid saving the crontab
+        :return: The job_ids of the added jobs
+        """
+        job_ids = []
+        with self.transaction():
+            for crontab_line in crontab_lines:
+                crontab_line = crontab_line.strip()
+                if not crontab_line or crontab_line.startswith('#'):
+                    continue
+                job_id = self.add_crontab_line(crontab_line, save_data=save_data)
+                if job_id:
+                    job_ids.append(job_id)
+        return job_ids
+
+    def apply_crontab_lines(self, crontab_lines: Iterable[str], old_crontab_lines: Dict[str, str], save_data: bool = True) -> Dict[str, str]:
+        """
+        Apply a changed crontab file. Only the lines which differ from the previous version are parsed, jobs of removed lines are removed.
+        Jobs with the same job_id are replaced, only the minutes which differ are updated in the schedule index.
+        :param crontab_lines: Crontab lines of the file, empty lines and comments are skipped
+        :param old_crontab_lines: {'job_id': 'crontab_line', ...} of the previous version of the file
+        :param save_data: Set to 'False' to avoid saving the crontab
+        :return: {'job_id': 'crontab_line', ...} of the new version of the file
+        """
+        old_job_ids: Dict[str, List[str]] = dict()  # {'crontab_line': ['job_id', ...], ...}, lines without '# job_id' get a new job_id on every parse
+        for job_id, crontab_line in old_crontab_lines.items():
+            old_job_ids.setdefault(crontab_line, []).append(job_id)
+
+        new_crontab_lines: Dict[str, str] = dict()
+        with self.transaction():
+            for crontab_line in crontab_lines:
+                crontab_line = crontab_line.strip()
+                if not crontab_line or crontab_line.startswith('#'):
+                    continue
+                job_ids = old_job_ids.get(crontab_line)
+                if job_ids:
+                    job_id = job_ids.pop()  # Unchanged
+                else:
+                    job_id = self.add_crontab_line(crontab_line, save_data=save_data)
+                if job_id:
+                    new_crontab_lines.update({job_id: crontab_line})
+            removed_job_ids = [job_id for job_id in old_crontab_lines.keys() if job_id not in new_crontab_lines]
+            for job_id in removed_job_ids:
+                self.remove_job(job_id, save_data=save_data)
+        if Verbosity.level >= Verbosity.SUMMARY:
+            log.debug(f"Applied {len(new_crontab_lines)} crontab lines, removed {len(removed_job_ids)} jobs")
+        return new_crontab_lines
+
+    def begin(self):
+        """ Start a transaction, jobs added until commit() is called are indexed, saved and announced only once """
+        self.cs.transaction_depth += 1
+
+    def commit(self):
+        """ End a transaction, the outermost commit() updates the schedule index and saves the crontab if requested """
+        if self.cs.transaction_depth <= 0:
+            return
+        self.cs.transaction_depth -= 1
+        if self.cs.transaction_depth:
+            return
+        pending_jobs = self.cs.pending_jobs
+        self.cs.pending_jobs = dict()
+        if pending_jobs:
+            self.cs.schedule_index.add_all(pending_jobs.values())
+            self.cs.schedule_index.compact()
+        if self.cs.pending_save:
+            self.cs.pending_save = False
+            CrontabO.request_save()
+        if self.cs.pending_notify:
+            # Only if jobs have been added, replaced or removed, a reload without changes keeps the schedule_version and the alarm
+            self.cs.pending_notify = False
+            self.cs.notify_schedule_changed()
+
+    @contextmanager
+    def transaction(self):
+        """
+        with ManageCrontab().transaction():
+            mc.add_job(...)
+            mc.add_crontab_line(...)
+        """
+        self.begin()
+        try:
+            yield self
+        finally:
+            self.commit()
+
     def _get_int(self, value: str, replacement_map: dict) -> int:
         """
         Convert a 'str' to 'int'
@@ -169,7 +461,8 @@ class ManageCrontab:
         :param end_value: custom end value when CrontabCategory.NONE is used
         :return:
         """
-        log.debug(f"_parse_time({crontab_time}, {category}, {start_value}, {end_value})")
+        if Verbosity.level >= Verbosity.PARSER:
+            log.debug(f"_parse_time({crontab_time}, {category}, {start_value}, {end_value})")
         if start_value < 0:
             start_value = 0
         times = []
@@ -0,0 +1,58 @@
+#
+# LICENSE https://creativecommons.org/licenses/by/4.0/ https://creativecommons.org/licenses/by/4.0/legalcode
+# © 2023 https://github.com/Oops19
+#
+
+
+from typing import Iterable, Union
+
+from crontab.enums.constants import CrontabConstant
+
+
+class Schedule:
+    """
+    A parsed schedule, the bit masks of a CronJob without callback and arguments.
+    Create it once and use it for many jobs:
+    Schedule(minutes=[0, 30], hours=range(8, 18), weekdays=[1, 2, 3, 4, 5]) runs every half hour from 8:00 to 17:30 on working days.
+    """
+    __slots__ = ('minute_mask', 'weekday_mask', 'season_mask', 'moon_phase_mask', )
+
+    def __init__(self, minutes: Union[Iterable[int], None] = None, hours: Union[Iterable[int], None] = None, weekdays: Union[Iterable[int], None] = None,
+                 seasons: Union[Iterable[int], None] = None, moon_phases: Union[Iterable[int], None] = None):
+        """
+        None matches all values, like '*' in a crontab line.
+        :param minutes: 0-59
+        :param hours: 0-23
+        :param weekdays: 0-6 (Sunday is 0)
+        :param seasons: 0-3 (Summer is 0)
+        :param moon_phases: 0-7 (New moon is 0)
+        """
+        minutes = range(CrontabConstant.MINUTE_MAX + 1) if minutes is None else list(minutes)
+        hours = range(CrontabConstant.HOUR_MAX + 1) if hours is None else hours
+        self.minute_mask = Schedule._to_mask((hour * 60 + minute for hour in hours for minute in minutes), CrontabConstant.MINUTES_PER_DAY - 1)
+        self.weekday_mask = Schedule._to_mask(weekdays, CrontabConstant.WEEKDAY_MAX)
+        self.season_mask = Schedule._to_mask(seasons, CrontabConstant.SEASON_MAX)
+        self.moon_phase_mask = Schedule._to_mask(moon_phases, CrontabConstant.MOON_PHASE_MAX)
+
+    @staticmethod
+    def from_masks(minute_mask: int, weekday_mask: int, season_mask: int, moon_phase_mask: int) -> 'Schedule':
+        """ :return: A schedule with the given bit masks, bit 'n' is set for minute 'n' (0-1439), weekday 'n', season 'n' or moon phase 'n' """
+        schedule = Schedule.__new__(Schedule)
+        schedule.minute_mask = minute_mask
+        schedule.weekday_mask = weekday_mask
+        schedule.season_mask = season_mask
+        schedule.moon_phase_mask = moon_phase_mask
+        return schedule
+
+    @staticmethod
+    def _to_mask(values: Union[Iterable[int], None], max_value: int) -> int:
+        if values is None:
+            return (1 << (max_value + 1)) - 1
+        mask = 0
+        for value in values:
+            if 0 <= value <= max_value:
+                mask |= 1 << value
+        return mask
+
+    def __repr__(self) -> str:
+        return f"Schedule(minutes={bin(self.minute_mask).count('1')} wd={self.weekday_mask:07b} s={self.season_mask:04b} mp={self.moon_phase_mask:08b})"
@@ -0,0 +1,184 @@
+#
+# LICENSE https://creativecommons.org/licenses/by/4.0/ https://creativecommons.org/licenses/by/4.0/legalcode
+# © 2023 https://github.com/Oops19
+#
+
+
+import sys
+from typing import List, Dict, Iterator, Iterable, Union, Tuple
+
+from crontab.enums.constants import CrontabConstant
+from crontab.store.cron_job import CronJob
+
+
+class ScheduleIndex:
+    """
+    Bit set index of all cron jobs. Every job gets a small integer handle, bit 'handle' is set in
+    'minute_jobs[t]' for every minute 't' the job is scheduled at and in the weekday, season and moon phase masks it matches.
+    The jobs due at a minute are 'minute_jobs[t] & weekday_jobs[weekday] & season_jobs[season] & moon_phase_jobs[moon_phase]'.
+    """
+
+    def __init__(self):
+        self.minute_jobs: List[int] = [0] * CrontabConstant.MINUTES_PER_DAY
+        self.weekday_jobs: List[int] = [0] * (CrontabConstant.WEEKDAY_MAX + 1)
+        self.season_jobs: List[int] = [0] * (CrontabConstant.SEASON_MAX + 1)
+        self.moon_phase_jobs: List[int] = [0] * (CrontabConstant.MOON_PHASE_MAX + 1)
+        self.catch_up_jobs: List[int] = [0] * (CrontabConstant.CATCH_UP_MAX + 1)
+        self._filter_jobs = (self.weekday_jobs, self.season_jobs, self.moon_phase_jobs, self.catch_up_jobs)  # Same order as CronJob.get_filter_masks()
+        self.minutes_mask: int = 0  # Bit 't' is set if any job is scheduled at minute 't'
+        self.job_ids: List[Union[str, None]] = list()  # ['job_id', ...], the list index is the handle
+        self._free_handles: List[int] = list()
+
+    @staticmethod
+    def to_mask(values: Iterable[int]) -> int:
+        mask = 0
+        for value in values:
+            mask |= 1 << value
+        return mask
+
+    @staticmethod
+    def iter_bits(mask: int) -> Iterator[int]:
+        """ Yield the positions of all set bits (job handles or minutes) in ascending order """
+        while mask:
+            low_bit = mask & -mask
+            yield low_bit.bit_length() - 1
+            mask ^= low_bit
+
+    def _assign_handle(self, job: CronJob) -> int:
+        if self._free_handles:
+            handle = self._free_handles.pop()
+            self.job_ids[handle] = job.job_id
+        else:
+            handle = len(self.job_ids)
+            self.job_ids.append(job.job_id)
+        job.handle = handle
+        return handle
+
+    def add(self, job: CronJob):
+        """ Assign a handle to the job and add it to the index """
+        handle = self._assign_handle(job)
+        bit = 1 << handle
+        minute_jobs = self.minute_jobs
+        for t in self.iter_bits(job.minute_mask):
+            minute_jobs[t] |= bit
+        self.minutes_mask |= job.minute_mask
+        self._add_filters(job, bit)
+
+    def add_all(self, jobs: Iterable[CronJob]):
+        """
+        Assign handles to all jobs and add them to the index in one go.
+        Jobs with the same schedule are merged first, so every minute and filter is updated once per distinct schedule and not once per job.
+        """
+        minute_groups: Dict[int, int] = dict()  # {minute_mask: handles, ...}
+        filter_groups: Dict[Tuple[int, ...], int] = dict()  # {(weekday_mask, season_mask, moon_phase_mask, catch_up_mask): handles, ...}
+        for job in jobs:
+            handle = self._assign_handle(job)
+            bit = 1 << handle
+            minute_groups[job.minute_mask] = minute_groups.get(job.minute_mask, 0) | bit
+            filter_masks = job.get_filter_masks()
+            filter_groups[filter_masks] = filter_groups.get(filter_masks, 0) | bit
+
+        minute_jobs = self.minute_jobs
+        for minute_mask, handles in minute_groups.items():
+            for t in self.iter_bits(minute_mask):
+                minute_jobs[t] |= handles
+            self.minutes_mask |= minute_mask
+        for filter_masks, handles in filter_groups.items():
+            for masks, job_mask in zip(self._filter_jobs, filter_masks):
+                for i in self.iter_bits(job_mask):
+                    masks[i] |= handles
+
+    def remove(self, job: CronJob):
+        """ Remove the job from the index and release its handle. Only the minutes of the job are touched. """
+        handle = job.handle
+        if handle < 0 or handle >= len(self.job_ids) or self.job_ids[handle] != job.job_id:
+            return
+        self._update(1 << handle, job, None)
+        self.job_ids[handle] = None
+        self._free_handles.append(handle)
+        job.handle = -1
+
+    def replace(self, old_job: CronJob, job: CronJob):
+        """ Replace a job, the new job keeps the handle. Only the minutes which differ between both jobs are touched. """
+        handle = old_job.handle
+        if handle < 0 or handle >= len(self.job_ids) or self.job_ids[handle] != old_job.job_id:
+            self.add(job)
+            return
+        self.job_ids[handle] = job.job_id
+        job.handle = handle
+        old_job.handle = -1
+        self._update(1 << handle, old_job, job)
+
+    def _update(self, bit: int, old_job: CronJob, job: Union[CronJob, None]):
+        """ Clear 'bit' in the slots only used by the old job and set it in the slots only used by the new job (if any) """
+        old_minute_mask = old_job.minute_mask
+        minute_mask = job.minute_mask if job else 0
+        minute_jobs = self.minute_jobs
+        for t in self.iter_bits(old_minute_mask & ~minute_mask):
+            minute_jobs[t] &= ~bit
+            if not minute_jobs[t]:
+                self.minutes_mask &= ~(1 << t)
+        for t in self.iter_bits(minute_mask & ~old_minute_mask):
+            minute_jobs[t] |= bit
+        self.minutes_mask |= minute_mask
+        filter_masks = job.get_filter_masks() if job else (0, ) * len(self._filter_jobs)
+        for masks, old_mask, mask in zip(self._filter_jobs, old_job.get_filter_masks(), filter_masks):
+            for i in self.iter_bits(old_mask & ~mask):
+                masks[i] &= ~bit
+            for i in self.iter_bits(mask & ~old_mask):
+                masks[i] |= bit
+
+    def _add_filters(self, job: CronJob, bit: int):
+        for masks, job_mask in zip(self._filter_jobs, job.get_filter_masks()):
+            for i in self.iter_bits(job_mask):
+                masks[i] |= bit
+
+    def get_day_mask(self, weekday: int, season: int, moon_phase: int) -> int:
+        """
+        :param weekday: Weekday (0-6)
+        :param season: Season (0-3) or -1 to match all seasons
+        :param moon_phase: Moon phase (0-7) or -1 to match all moon phases
+        :return: Handles of the jobs which may run on a day with these properties
+        """
+        mask = self.weekday_jobs[weekday]
+        if season >= 0:
+            mask &= self.season_jobs[season]
+        if moon_phase >= 0:
+            mask &= self.moon_phase_jobs[moon_phase]
+        return mask
+
+    def get_due(self, t: int, weekday: int, season: int, moon_phase: int) -> int:
+        """ :return: Handles of the jobs due at minute 't' (0-1439) on a day with these properties """
+        mask = self.minute_jobs[t]
+        if mask:
+            mask &= self.get_day_mask(weekday, season, moon_phase)
+        return mask
+
+    def get_minutes_until_next_job(self, t_now: int) -> Union[int, None]:
+        """
+        :param t_now: Current minute of the day (0-1439)
+        :return: Minutes (1-1440) until the next minute with scheduled jobs or None if no jobs are scheduled.
+        """
+        minutes_mask = self.minutes_mask
+        if not minutes_mask:
+            return None
+        later = minutes_mask >> (t_now + 1)
+        if later:
+            return (later & -later).bit_length()
+        return (minutes_mask & -minutes_mask).bit_length() - 1 + CrontabConstant.MINUTES_PER_DAY - t_now
+
+    def compact(self):
+        """ Share identical per-minute masks, e.g. all minutes of a table with only '* * * * *' jobs use one int """
+        pool: Dict[int, int] = dict()
+        self.minute_jobs = [pool.setdefault(mask, mask) for mask in self.minute_jobs]
+
+    def get_memory(self) -> int:
+        """ :return: Approximate size of the index in bytes """
+        size = sys.getsizeof(self.minute_jobs) + sys.getsizeof(self.job_ids)
+        seen = set()
+        for masks in (self.minute_jobs, self.weekday_jobs, self.season_jobs, self.moon_phase_jobs):
+            for mask in masks:
+                if id(mask) not in seen:
+                    seen.add(id(mask))
+                    size += sys.getsizeof(mask)
+        return size
@@ -0,0 +1,40 @@
+#
+# License: https://creativecommons.org/licenses/by/4.0/ https://creativecommons.org/licenses/by/4.0/legalcode
+# © 2023 https://github.com/Oops19
+#
+
+
+from typing import Any, NamedTuple, Tuple
+
+from crontab.enums.constants import CrontabConstant
+
+
+class TimeContext(NamedTuple):
+    """
+    The sim time of one scheduler tick. It is read once per tick from one game time value and passed to the code which needs it.
+    """
+    date_and_time: Any  # The value returned by CrontabEnvironment.get_date_and_time()
+    absolute_minute: int  # Minutes since the start of the game
+    minute: int  # Minute of the day (0-1439)
+    weekday: int  # 0-6
+    season: int  # 0-3 or -1 if unknown
+    moon_phase: int  # 0-7 or -1 if unknown
+    season_day: int = 0  # Days since the start of the current season
+    season_length: int = CrontabConstant.SEASON_LENGTH_DAYS
+    moon_phase_day: int = 0  # Days since the start of the current moon phase
+    moon_phase_length: int = CrontabConstant.MOON_PHASE_LENGTH_DAYS
+
+    def get_day(self, day_offset: int) -> Tuple[int, int, int]:
+        """
+        Estimate weekday, season and moon phase of another day with the current season and moon phase and their lengths.
+        :param day_offset: Days from today, negative values for past days
+        :return: weekday, season and moon phase of today + day_offset, unknown seasons and moon phases stay -1
+        """
+        weekday = (self.weekday + day_offset) % 7
+        season = self.season
+        if season >= 0:
+            season = (season + (self.season_day + day_offset) // max(1, self.season_length)) % 4
+        moon_phase = self.moon_phase
+        if moon_phase >= 0:
+            moon_phase = (moon_phase + (self.moon_phase_day + day_offset) // max(1, self.moon_phase_length)) % 8
+        return weekday, season, moon_phase
@@ -4,10 +4,17 @@
 #
 
 
+from crontab.job_pool import JobPool
 from crontab.modinfo import ModInfo
+from crontab.next_fire import NextFire
+from crontab.profiling_export import ProfilingExport
+from crontab.scheduler import Scheduler
+from crontab.store.callback_resolver import CallbackResolver
+from crontab.store.crontab_i import CrontabI
 from crontab.store.crontab_o import CrontabO
 from crontab.store.crontab_store import CrontabStore
 from crontab.store.manage_crontab import ManageCrontab
+from crontab.verbosity import Verbosity
 
 from sims4communitylib.dialogs.common_choice_outcome import CommonChoiceOutcome
 from sims4communitylib.dialogs.common_input_text_dialog import CommonInputTextDialog
@@ -63,12 +70,15 @@ class CrontabUI:
     def o19_cmd_crontab_show(output: CommonConsoleCommandOutput):
         try:
             cs = CrontabStore()
+            index = cs.schedule_index
+            schedules = {t: [index.job_ids[handle] for handle in index.iter_bits(handles)] for t, handles in enumerate(index.minute_jobs) if handles}
             output(f"crontab_lines: {cs.crontab_lines}")
             output(f"cron_jobs: {cs.cron_jobs}")
-            output(f"schedules: {cs.cron_job_schedules}")
+            output(f"schedules: {schedules}")
+            output(f"index: {index.get_memory()} bytes")
             log.debug(f"crontab_lines: {cs.crontab_lines}")
             log.debug(f"cron_jobs: {cs.cron_jobs}")
-            log.debug(f"schedules: {cs.cron_job_schedules}")
+            log.debug(f"schedules: {schedules}")
             output("ok")
         except Exception as e:
             output(f"Error: {e}")
@@ -118,3 +128,228 @@ class CrontabUI:
             output(f"ok")
         except Exception as e:
             output(f"Error: {e}")
+
+    @staticmethod
+    @CommonConsoleCommand(
+        ModInfo.get_identity(),
+        'o19.crontab.alarms',
+        "Usage: o19.crontab.alarms [true|false] to use one sim-time alarm for the next due job instead of polling every second.",
+        command_arguments=(
+                CommonConsoleCommandArgument('use_alarms', 'bool', 'True to use alarms, False to poll. Omit it to show the current mode.', is_optional=True),
+        )
+    )
+    def o19_cmd_crontab_alarms(output: CommonConsoleCommandOutput, use_alarms: bool = None):
+        try:
+            use_alarms = Scheduler().alarms(use_alarms)
+            output(f"ok (use_alarms={use_alarms})")
+        except Exception as e:
+            output(f"Error: {e}")
+
+    @staticmethod
+    @CommonConsoleCommand(
+        ModInfo.get_identity(),
+        'o19.crontab.next',
+        "Usage: o19.crontab.next [job_id] [count] to list the next fire times of one or all jobs.",
+        command_arguments=(
+                CommonConsoleCommandArgument('job_id', 'str', "The job to check, '*' for all jobs.", is_optional=True, default_value='*'),
+                CommonConsoleCommandArgument('count', 'int', 'Number of fire times to list.', is_optional=True, default_value=10),
+        )
+    )
+    def o19_cmd_crontab_next(output: CommonConsoleCommandOutput, job_id: str = '*', count: int = 10):
+        try:
+            ctx = Scheduler.env.get_time_context()
+            nf = NextFire()
+            fire_times = nf.get_next_fire_times(None if job_id == '*' else job_id, ctx, count=count)
+            for day_offset, t, _job_id in fire_times:
+                output(f"{nf.format_fire_time(day_offset, t, ctx.weekday)} {_job_id}")
+            output(f"ok ({len(fire_times)} fire times)")
+        except Exception as e:
+            output(f"Error: {e}")
+
+    @staticmethod
+    @CommonConsoleCommand(
+        ModInfo.get_identity(),
+        'o19.crontab.load',
+        "Usage: o19.crontab.load [count] to list the minutes of today with the most jobs.",
+        command_arguments=(
+                CommonConsoleCommandArgument('count', 'int', 'Number of minutes to list.', is_optional=True, default_value=10),
+        )
+    )
+    def o19_cmd_crontab_load(output: CommonConsoleCommandOutput, count: int = 10):
+        try:
+            ctx = Scheduler.env.get_time_context()
+            nf = NextFire()
+            load = nf.get_minute_load(ctx)
+            for t, jobs in sorted(load, key=lambda _load: (-_load[1], _load[0]))[:count]:
+                output(f"{nf.format_fire_time(0, t, ctx.weekday)} {jobs} jobs")
+            total = sum(jobs for _, jobs in load)
+            output(f"ok ({total} runs in {len(load)} minutes, max {max((jobs for _, jobs in load), default=0)} per minute)")
+        except Exception as e:
+            output(f"Error: {e}")
+
+    @staticmethod
+    @CommonConsoleCommand(
+        ModInfo.get_identity(),
+        'o19.crontab.budget',
+        "Usage: o19.crontab.budget [max_ms] [max_jobs] to limit the time and number of jobs per tick (0 for no limit). Jobs beyond it run in the next ticks.",
+        command_arguments=(
+                CommonConsoleCommandArgument('max_ms', 'float', 'Max. milliseconds per tick.', is_optional=True),
+                CommonConsoleCommandArgument('max_jobs', 'int', 'Max. number of jobs per tick.', is_optional=True),
+        )
+    )
+    def o19_cmd_crontab_budget(output: CommonConsoleCommandOutput, max_ms: float = None, max_jobs: int = None):
+        try:
+            max_ms, max_jobs = Scheduler().budget(max_ms, max_jobs)
+            output(f"ok (max_ms={max_ms}, max_jobs={max_jobs}, {Scheduler.get_queue_state()})")
+        except Exception as e:
+            output(f"Error: {e}")
+
+    @staticmethod
+    @CommonConsoleCommand(
+        ModInfo.get_identity(),
+        'o19.crontab.tick',
+        "Usage: o19.crontab.tick [adaptive] [min_ms] [max_ms] to wake up the scheduler shortly after the next due sim minute instead of every second. "
+        "The adaptive mode only lengthens the interval, 'min_ms' can't be below 1000.",
+        command_arguments=(
+                CommonConsoleCommandArgument('adaptive', 'bool', 'False to wake up every second.', is_optional=True),
+                CommonConsoleCommandArgument('min_ms', 'float', 'Min. milliseconds between two wake-ups, at least 1000.', is_optional=True),
+                CommonConsoleCommandArgument('max_ms', 'float', 'Max. milliseconds between two wake-ups.', is_optional=True),
+        )
+    )
+    def o19_cmd_crontab_tick(output: CommonConsoleCommandOutput, adaptive: bool = None, min_ms: float = None, max_ms: float = None):
+        try:
+            adaptive, min_ms, max_ms = Scheduler().tick(adaptive, min_ms, max_ms)
+            output(f"ok (adaptive={adaptive}, min_ms={min_ms}, max_ms={max_ms}, {Scheduler.speed_data})")
+        except Exception as e:
+            output(f"Error: {e}")
+
+    @staticmethod
+    @CommonConsoleCommand(
+        ModInfo.get_identity(),
+        'o19.crontab.validate',
+        "Usage: o19.crontab.validate to import the callbacks of all jobs now and list the ones which can't be resolved.",
+    )
+    def o19_cmd_crontab_validate(output: CommonConsoleCommandOutput):
+        try:
+            CallbackResolver.clear_cache()
+            errors = ManageCrontab().validate_jobs()
+            for job_id, error in errors.items():
+                output(f"{job_id}: {error}")
+            output(f"ok ({len(errors)} invalid jobs)")
+        except Exception as e:
+            output(f"Error: {e}")
+
+    @staticmethod
+    @CommonConsoleCommand(
+        ModInfo.get_identity(),
+        'o19.crontab.reload',
+        "Usage: o19.crontab.reload [auto_reload] to apply the changes of 'crontab.txt' and 'crontab.d/*.txt' now and to en-/disable the automatic reload.",
+        command_arguments=(
+                CommonConsoleCommandArgument('auto_reload', 'bool', "True to check the crontab files for changes every few seconds. Omit it to keep the current setting.", is_optional=True),
+        )
+    )
+    def o19_cmd_crontab_reload(output: CommonConsoleCommandOutput, auto_reload: bool = None):
+        try:
+            if auto_reload is not None:
+                CrontabI.auto_reload = auto_reload
+            files, changes = CrontabI().reload(force=True)
+            output(f"ok ({files} files, {changes} changes, auto_reload={CrontabI.auto_reload})")
+        except Exception as e:
+            output(f"Error: {e}")
+
+    @staticmethod
+    @CommonConsoleCommand(
+        ModInfo.get_identity(),
+        'o19.crontab.profile',
+        "Usage: o19.crontab.profile [count] [reset] to show the tick statistics and the jobs with the highest p95 exec times (ms).",
+        command_arguments=(
+                CommonConsoleCommandArgument('count', 'int', 'Number of jobs to list.', is_optional=True, default_value=10),
+                CommonConsoleCommandArgument('reset', 'bool', 'True to reset the profiling data afterwards.', is_optional=True, default_value=False),
+        )
+    )
+    def o19_cmd_crontab_profile(output: CommonConsoleCommandOutput, count: int = 10, reset: bool = False):
+        try:
+            data = Scheduler.get_profiling_data(detailed=True)
+            for name, stats in data.get('ticks').items():
+                output(f"{name}: n={stats['count']} mean={stats['mean']:.2f} p50={stats['p50']:.2f} p95={stats['p95']:.2f} max={stats['max']:.2f}")
+            jobs = sorted(data.get('jobs').items(), key=lambda item: (item[1]['p95'], item[1]['max']), reverse=True)
+            for job_id, stats in jobs[:count]:
+                output(f"{job_id}: n={stats['count']} mean={stats['mean']:.3f} p50={stats['p50']:.3f} p95={stats['p95']:.3f} max={stats['max']:.3f} ms")
+            if reset:
+                Scheduler.reset_profiling_data()
+            output(f"ok ({len(jobs)} jobs)")
+        except Exception as e:
+            output(f"Error: {e}")
+
+    @staticmethod
+    @CommonConsoleCommand(
+        ModInfo.get_identity(),
+        'o19.crontab.export',
+        "Usage: o19.crontab.export [interval_s] [jsonl|csv] to append the profiling data to 'mod_logs/Crontab_Profiling.*' every 'interval_s' seconds (0 to stop).",
+        command_arguments=(
+                CommonConsoleCommandArgument('interval_s', 'float', 'Seconds between two snapshots, 0 to stop the export.', is_optional=True),
+                CommonConsoleCommandArgument('file_format', 'str', "'jsonl' or 'csv'.", is_optional=True),
+        )
+    )
+    def o19_cmd_crontab_export(output: CommonConsoleCommandOutput, interval_s: float = None, file_format: str = None):
+        try:
+            interval_s, file_format = ProfilingExport.export(interval_s, file_format)
+            output(f"ok (interval_s={interval_s}, file='{ProfilingExport.get_file_name()}', pending={len(ProfilingExport.snapshots)})")
+        except Exception as e:
+            output(f"Error: {e}")
+
+    @staticmethod
+    @CommonConsoleCommand(
+        ModInfo.get_identity(),
+        'o19.crontab.verbosity',
+        "Usage: o19.crontab.verbosity [level] to set the debug log level: 0 = off, 1 = load and reload summaries, 2 = every tick and job, 3 = parser details.",
+        command_arguments=(
+                CommonConsoleCommandArgument('level', 'int', 'Debug log level (0-3). Omit it to show the current level.', is_optional=True),
+        )
+    )
+    def o19_cmd_crontab_verbosity(output: CommonConsoleCommandOutput, level: int = None):
+        try:
+            level = Verbosity.verbosity(level)
+            output(f"ok (level={level})")
+        except Exception as e:
+            output(f"Error: {e}")
+
+    @staticmethod
+    @CommonConsoleCommand(
+        ModInfo.get_identity(),
+        'o19.crontab.health',
+        "Usage: o19.crontab.health [job_id] [reset] to list the jobs which failed or were too slow and to enable them again.",
+        command_arguments=(
+                CommonConsoleCommandArgument('job_id', 'str', "The job to show or reset, '*' for all jobs.", is_optional=True, default_value='*'),
+                CommonConsoleCommandArgument('reset', 'bool', 'True to clear the backoff and enable the job(s) again.', is_optional=True, default_value=False),
+        )
+    )
+    def o19_cmd_crontab_health(output: CommonConsoleCommandOutput, job_id: str = '*', reset: bool = False):
+        try:
+            for _job_id, health in Scheduler.get_health_data().items():
+                if job_id in ('*', _job_id):
+                    output(f"{_job_id}: {health}")
+            if reset:
+                count = Scheduler.reset_health(None if job_id == '*' else job_id)
+                output(f"ok ({count} jobs reset)")
+            else:
+                output("ok")
+        except Exception as e:
+            output(f"Error: {e}")
+
+    @staticmethod
+    @CommonConsoleCommand(
+        ModInfo.get_identity(),
+        'o19.crontab.pool',
+        "Usage: o19.crontab.pool [max_workers] [max_pending] to set the worker threads and the max number of pending jobs of the '@thread' jobs.",
+        command_arguments=(
+                CommonConsoleCommandArgument('max_workers', 'int', 'Number of worker threads.', is_optional=True),
+                CommonConsoleCommandArgument('max_pending', 'int', 'Jobs which may be pending, further jobs are skipped.', is_optional=True),
+        )
+    )
+    def o19_cmd_crontab_pool(output: CommonConsoleCommandOutput, max_workers: int = None, max_pending: int = None):
+        try:
+            JobPool.pool(max_workers, max_pending)
+            output(f"ok ({JobPool.get_data()})")
+        except Exception as e:
+            output(f"Error: {e}")
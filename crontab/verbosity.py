@@ -0,0 +1,26 @@
+#
+# License: https://creativecommons.org/licenses/by/4.0/ https://creativecommons.org/licenses/by/4.0/legalcode
+# © 2023 https://github.com/Oops19
+#
+
+
+class Verbosity:
+    """
+    Gate for the debug messages of the scheduler and the store. Check the level before calling log.debug() so the f-string is not built at all:
+    if Verbosity.level >= Verbosity.JOBS:
+        log.debug(f"...")
+    Warnings and errors are always logged.
+    """
+    OFF = 0
+    SUMMARY = 1  # Once per load, reload or save
+    JOBS = 2  # Per tick and per job
+    PARSER = 3  # Per crontab field
+
+    level: int = SUMMARY
+
+    @staticmethod
+    def verbosity(level: int = None) -> int:
+        """ Set the level (0-3); use None to query the current level """
+        if level is not None:
+            Verbosity.level = max(Verbosity.OFF, min(Verbosity.PARSER, level))
+        return Verbosity.level